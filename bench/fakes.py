@@ -0,0 +1,227 @@
+"""Local stand-ins for every service the orchestrator talks to.
+
+One FastAPI app serves all of them, so the orchestrator can be pointed at a
+single port:
+
+    WHISPER_URL / TTS_URL / OLLAMA_URL = http://127.0.0.1:<port>
+    WEATHER_URL  = http://127.0.0.1:<port>/weather.php
+    CALENDAR_URL = http://127.0.0.1:<port>/calendar.php
+
+Every stage sleeps for a latency drawn from its Profile (log-normal around a
+median), fails with the configured probability and can be limited to a fixed
+number of concurrent calls, which mimics a single model server on a CPU box.
+"""
+import io
+import re
+import json
+import time
+import wave
+import random
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Request, Form, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Uploads carrying this prefix are "transcribed" to the text that follows it
+FAKE_ASR_PREFIX = b"FAKEASR:"
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class Profile:
+    """Latency/error model of one stage: median_ms[:sigma[:error_rate[:capacity]]]."""
+
+    def __init__(self, median_ms, sigma=0.25, error_rate=0.0, capacity=0):
+        self.median_ms = float(median_ms)
+        self.sigma = float(sigma)
+        self.error_rate = float(error_rate)
+        self.capacity = int(capacity)
+
+    @classmethod
+    def parse(cls, spec):
+        return cls(*spec.split(":"))
+
+    def sample(self):
+        return self.median_ms / 1000 * random.lognormvariate(0, self.sigma) if self.sigma else self.median_ms / 1000
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+    def __repr__(self):
+        return f"{self.median_ms:g}ms~{self.sigma:g} err={self.error_rate:g} cap={self.capacity or 'inf'}"
+
+
+# Rough numbers for gemma:2b / base.en / MeloTTS on a CPU box
+DEFAULT_PROFILES = {
+    "asr": Profile(450, 0.3, 0.0, 1),
+    "llm": Profile(900, 0.3, 0.0, 1),   # time to first token
+    "tts": Profile(600, 0.3, 0.0, 1),
+    "weather": Profile(150, 0.4),
+    "calendar": Profile(120, 0.4),
+}
+# Per generated token once the LLM has started answering
+LLM_TOKEN_MS = 25
+
+
+class StageRecorder:
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.limits = {name: asyncio.Semaphore(p.capacity) for name, p in profiles.items() if p.capacity}
+        self.samples = {name: [] for name in profiles}
+        self.errors = {name: 0 for name in profiles}
+
+    async def run(self, stage, extra_seconds=0.0):
+        """Simulate the stage's service time. Returns False if the call should fail."""
+        start = time.perf_counter()
+        limit = self.limits.get(stage)
+        if limit:
+            async with limit:
+                await asyncio.sleep(self.profiles[stage].sample() + extra_seconds)
+        else:
+            await asyncio.sleep(self.profiles[stage].sample() + extra_seconds)
+        self.samples[stage].append(time.perf_counter() - start)
+        if self.profiles[stage].fails():
+            self.errors[stage] += 1
+            return False
+        return True
+
+    def reset(self):
+        for name in self.samples:
+            self.samples[name] = []
+            self.errors[name] = 0
+
+
+def silent_wav(seconds, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def fake_llm_reply(prompt):
+    """Answers shaped like gemma's for the orchestrator's three prompt types."""
+    if "Extract ONLY the city name" in prompt:
+        match = re.search(r"\b(?:in|for)\s+([A-Z][\w\-]+)", prompt)
+        return match.group(1) if match else "NONE"
+    if "Extract JSON for calendar" in prompt:
+        request = re.search(r'User Request: "(.*)"', prompt)
+        text = (request.group(1) if request else "").lower()
+        action = ("update" if any(k in text for k in ["update", "change", "move"]) else
+                  "delete" if any(k in text for k in ["delete", "remove"]) else
+                  "create" if any(k in text for k in ["add", "create", "schedule"]) else "list")
+        start = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%dT09:00")
+        return json.dumps({"action": action, "title": "Team Meeting", "start_time": start, "location": "TBD"})
+    return ("Sure, here is a short answer. Voice assistants turn speech into text and back again. "
+            "Is there anything else I can help you with?")
+
+
+def create_app(profiles=None):
+    profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+    stages = StageRecorder(profiles)
+    calendar = {}
+    next_id = [1]
+    app = FastAPI()
+
+    # --- Whisper ---
+    @app.post("/transcribe")
+    async def transcribe(request: Request):
+        # Multipart upload or a raw audio/L16 body, like the real service
+        if request.headers.get("content-type", "").lower().startswith("audio/l16"):
+            data = await request.body()
+        else:
+            data = await (await request.form())["file"].read()
+        if not await stages.run("asr"):
+            return {"text": "", "error": "fake ASR failure"}
+        text = data[len(FAKE_ASR_PREFIX):].decode("utf-8") if data.startswith(FAKE_ASR_PREFIX) else ""
+        return {"text": text}
+
+    # --- TTS ---
+    @app.post("/synthesize")
+    async def synthesize(request: Request):
+        body = await request.json()
+        text = body.get("text") or " ".join(s.get("text", "") for s in body.get("segments") or [])
+        # Synthesis time grows with the text, ~60 ms of audio per character
+        if not await stages.run("tts", extra_seconds=len(text) / 1000):
+            return Response(status_code=500)
+        seconds = len(text) * 0.06
+        return Response(content=silent_wav(seconds), media_type="audio/wav",
+                        headers={"X-Audio-Duration": f"{seconds:.3f}"})
+
+    # --- Ollama ---
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        if not await stages.run("llm"):
+            return JSONResponse({"error": "fake LLM failure"}, status_code=500)
+        reply = fake_llm_reply(prompt)
+        model = body.get("model", "gemma:2b")
+
+        def chunk(content, done=False):
+            message = {"model": model, "created_at": datetime.utcnow().isoformat() + "Z",
+                       "message": {"role": "assistant", "content": content}, "done": done}
+            if done:
+                message.update(done_reason="stop", total_duration=0, eval_count=len(reply.split()))
+            return json.dumps(message) + "\n"
+
+        if body.get("stream") is False:
+            await asyncio.sleep(LLM_TOKEN_MS / 1000 * len(reply.split()))
+            return JSONResponse(json.loads(chunk(reply, done=True)))
+
+        async def tokens():
+            for word in re.findall(r"\S+\s*", reply):
+                await asyncio.sleep(LLM_TOKEN_MS / 1000)
+                yield chunk(word)
+            yield chunk("", done=True)
+
+        return StreamingResponse(tokens(), media_type="application/x-ndjson")
+
+    # --- Weather API ---
+    @app.post("/weather.php")
+    async def weather(place: str = Form("")):
+        if not await stages.run("weather"):
+            return Response(status_code=500)
+        forecast = [{"day": DAYS[(datetime.now().weekday() + i) % 7],
+                     "weather": random.choice(["clear sky", "light rain", "overcast clouds"]),
+                     "temperature": {"min": random.randint(-2, 10), "max": random.randint(11, 24)}}
+                    for i in range(7)]
+        return {"place": place, "forecast": forecast}
+
+    # --- Calendar API ---
+    @app.api_route("/calendar.php", methods=["GET", "POST", "PUT", "DELETE"])
+    async def calendar_api(request: Request):
+        if not await stages.run("calendar"):
+            return Response(status_code=500)
+        event_id = request.query_params.get("id")
+        event_id = int(event_id) if event_id else None
+        if request.method == "GET":
+            if event_id is not None:
+                return calendar.get(event_id) or JSONResponse({"error": "not found"}, status_code=404)
+            return list(calendar.values())
+        if request.method == "POST":
+            event = {**await request.json(), "id": next_id[0]}
+            calendar[next_id[0]] = event
+            next_id[0] += 1
+            return JSONResponse(event, status_code=201)
+        if event_id not in calendar:
+            return JSONResponse({"error": "not found"}, status_code=404)
+        if request.method == "PUT":
+            calendar[event_id].update(await request.json())
+            return calendar[event_id]
+        del calendar[event_id]
+        return {"deleted": event_id}
+
+    # --- Harness hooks ---
+    @app.get("/_stats")
+    async def stats():
+        return {"samples": stages.samples, "errors": stages.errors}
+
+    @app.post("/_reset")
+    async def reset():
+        stages.reset()
+        return {"ok": True}
+
+    return app
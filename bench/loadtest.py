@@ -0,0 +1,268 @@
+"""Hermetic load test for the orchestrator's /process endpoint.
+
+Starts the fake backends (fakes.py) and an orchestrator wired to them, replays
+the utterance corpus at a fixed concurrency and reports end-to-end and
+per-stage latency percentiles plus throughput. No GPU, Ollama or internet
+access is needed.
+
+    python bench/loadtest.py --requests 200 --concurrency 8
+    python bench/loadtest.py --stage llm=2000:0.3:0.05:1 --json results.json
+    python bench/loadtest.py --baseline results.json --max-regression 0.15
+
+Stage profiles are median_ms[:sigma[:error_rate[:capacity]]]; stages are
+asr, llm, tts, weather and calendar.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+import subprocess
+import httpx
+import uvicorn
+from fakes import create_app, Profile, DEFAULT_PROFILES, FAKE_ASR_PREFIX
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ORCHESTRATOR_DIR = os.path.join(HERE, "..", "orchestrator")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+    }
+
+
+def parse_server_timing(header):
+    """'asr;dur=412.3, llm_chat;dur=980.1' -> {"asr": 0.4123, "llm_chat": 0.9801}.
+
+    Repeated stages (llm_chat-2) are folded into their base name.
+    """
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name or not params.startswith("dur="):
+            continue
+        name = name.rsplit("-", 1)[0]
+        timings[name] = timings.get(name, 0.0) + float(params[4:]) / 1000
+    return timings
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- Processes ---
+def start_fakes(port, profiles):
+    server = uvicorn.Server(uvicorn.Config(create_app(profiles), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server
+
+
+def start_orchestrator(port, fakes_url, extra_env, verbose=False):
+    env = {
+        **os.environ,
+        "WHISPER_URL": fakes_url,
+        "TTS_URL": fakes_url,
+        "OLLAMA_URL": fakes_url,
+        "WEATHER_URL": f"{fakes_url}/weather.php",
+        "CALENDAR_URL": f"{fakes_url}/calendar.php",
+        **extra_env,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ORCHESTRATOR_DIR, env=env,
+        stdout=None if verbose else subprocess.DEVNULL, stderr=None if verbose else subprocess.DEVNULL)
+
+
+async def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+# --- Load ---
+async def replay(orchestrator_url, corpus, total, concurrency):
+    """Send `total` requests (corpus cycled) with at most `concurrency` in flight."""
+    results = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(corpus[i % len(corpus)])
+
+    async def worker(client):
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            files = {"file": ("audio.wav", FAKE_ASR_PREFIX + item["text"].encode("utf-8"), "audio/wav")}
+            start = time.perf_counter()
+            timings = {}
+            try:
+                res = await client.post(f"{orchestrator_url}/process", files=files)
+                ok = res.status_code == 200 and bool(res.content)
+                timings = parse_server_timing(res.headers.get("server-timing"))
+            except httpx.HTTPError:
+                ok = False
+            results.append({"id": item["id"], "category": item.get("category", "other"),
+                            "seconds": time.perf_counter() - start, "ok": ok, "timings": timings})
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return results, wall
+
+
+def build_report(results, wall, stage_stats, args):
+    ok = [r for r in results if r["ok"]]
+    report = {
+        "config": {"requests": args.requests, "concurrency": args.concurrency,
+                   "profiles": {name: repr(p) for name, p in args.profiles.items()}},
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "end_to_end": summarize([r["seconds"] for r in ok]),
+        "by_category": {},
+        "stages": {},
+        "orchestrator_stages": {},
+    }
+    for category in sorted({r["category"] for r in ok}):
+        report["by_category"][category] = summarize([r["seconds"] for r in ok if r["category"] == category])
+    for stage, samples in stage_stats["samples"].items():
+        if samples:
+            report["stages"][stage] = {**summarize(samples), "errors": stage_stats["errors"][stage]}
+    # As seen from the orchestrator (Server-Timing): includes queueing for backend slots
+    for stage in sorted({name for r in ok for name in r["timings"]}):
+        report["orchestrator_stages"][stage] = summarize([r["timings"][stage] for r in ok if stage in r["timings"]])
+    return report
+
+
+def print_report(report):
+    def row(name, s):
+        print(f"{name:<18}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+
+    print(f"\nThroughput: {report['throughput_rps']} req/s   errors: {report['error_rate'] * 100:.1f}%")
+    print(f"{'':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    row("end-to-end", report["end_to_end"])
+    for category, s in report["by_category"].items():
+        row(f"  {category}", s)
+    for stage, s in report["stages"].items():
+        row(f"stage: {stage}", s)
+    for stage, s in report.get("orchestrator_stages", {}).items():
+        row(f"timing: {stage}", s)
+
+
+def check_regression(report, baseline_path, max_regression):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = []
+    for key in ("p50_ms", "p95_ms"):
+        old, new = baseline["end_to_end"][key], report["end_to_end"][key]
+        if old and new > old * (1 + max_regression):
+            failures.append(f"end-to-end {key}: {old} -> {new}")
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - max_regression):
+        failures.append(f"throughput: {baseline['throughput_rps']} -> {report['throughput_rps']}")
+    return failures
+
+
+async def main(args):
+    random.seed(args.seed)
+    corpus = load_corpus(args.corpus)
+    fakes_port = args.fakes_port or free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    fakes = start_fakes(fakes_port, args.profiles)
+    await wait_until_up(f"{fakes_url}/_stats")
+
+    orchestrator = None
+    orchestrator_url = args.orchestrator_url
+    if not orchestrator_url:
+        port = free_port()
+        orchestrator_url = f"http://127.0.0.1:{port}"
+        orchestrator = start_orchestrator(port, fakes_url, dict(e.split("=", 1) for e in args.env), args.verbose)
+    try:
+        await wait_until_up(f"{orchestrator_url}/router/stats")
+        if args.warmup:
+            await replay(orchestrator_url, corpus, args.warmup, args.concurrency)
+        async with httpx.AsyncClient() as client:
+            await client.post(f"{fakes_url}/_reset")
+        print(f"Replaying {args.requests} requests ({len(corpus)} utterances) at concurrency {args.concurrency}...")
+        results, wall = await replay(orchestrator_url, corpus, args.requests, args.concurrency)
+        async with httpx.AsyncClient() as client:
+            stage_stats = (await client.get(f"{fakes_url}/_stats")).json()
+    finally:
+        if orchestrator:
+            orchestrator.terminate()
+            orchestrator.wait(timeout=10)
+        fakes.should_exit = True
+
+    report = build_report(results, wall, stage_stats, args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        failures = check_regression(report, args.baseline, args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(HERE, "corpus.jsonl"))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent before measuring")
+    parser.add_argument("--stage", action="append", default=[], metavar="NAME=PROFILE",
+                        help="override a stage profile, e.g. llm=2000:0.3:0.05:1")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the orchestrator")
+    parser.add_argument("--fakes-port", type=int, help="fixed port for the fakes (default: any free port)")
+    parser.add_argument("--orchestrator-url", help="use a running orchestrator wired to the fakes (see --fakes-port)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json report")
+    parser.add_argument("--max-regression", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the orchestrator's logs")
+    args = parser.parse_args(argv)
+    args.profiles = dict(DEFAULT_PROFILES)
+    for spec in args.stage:
+        name, profile = spec.split("=", 1)
+        args.profiles[name] = Profile.parse(profile)
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -3,6 +3,7 @@ echo "--- Creating Cache Directories ---"
 mkdir -p model_cache/ollama
 mkdir -p model_cache/huggingface
 mkdir -p model_cache/nltk
+mkdir -p model_cache/tts
 
 echo "--- Pulling Ollama Model (Gemma:2b) ---"
 # Temporarily start ollama to pull the model to our local volume
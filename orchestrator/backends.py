@@ -0,0 +1,109 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import httpx
+from prometheus_client import Histogram, Gauge
+import telemetry
+
+logger = logging.getLogger("backends")
+
+# --- Connection Pool ---
+# One keep-alive pool shared by every outgoing call (Whisper, TTS, weather, calendar).
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+# --- Per-Backend Limits ---
+# Concurrency: how many calls may be in flight per backend. Excess calls wait in
+# the semaphore queue instead of piling up on a CPU-bound model server.
+# Timeout: read timeout in seconds for a single call.
+BACKENDS = {
+    "whisper": {"concurrency": int(os.getenv("WHISPER_CONCURRENCY", "2")),
+                "timeout": float(os.getenv("WHISPER_TIMEOUT", "60"))},
+    "tts": {"concurrency": int(os.getenv("TTS_CONCURRENCY", "2")),
+            "timeout": float(os.getenv("TTS_TIMEOUT", "120"))},
+    "ollama": {"concurrency": int(os.getenv("OLLAMA_CONCURRENCY", "1")),
+               "timeout": float(os.getenv("OLLAMA_TIMEOUT", "180"))},
+    "weather": {"concurrency": int(os.getenv("WEATHER_CONCURRENCY", "8")),
+                "timeout": float(os.getenv("WEATHER_TIMEOUT", "10"))},
+    "calendar": {"concurrency": int(os.getenv("CALENDAR_CONCURRENCY", "4")),
+                 "timeout": float(os.getenv("CALENDAR_TIMEOUT", "10"))},
+}
+
+_client = None
+_semaphores = {}
+_waiting = {name: 0 for name in BACKENDS}
+
+QUEUE_SECONDS = Histogram("backend_queue_seconds", "Time spent waiting for a backend slot",
+                          ["backend"], buckets=telemetry.LATENCY_BUCKETS)
+CALL_SECONDS = Histogram("backend_call_seconds", "Latency of one outgoing call",
+                         ["backend", "status"], buckets=telemetry.LATENCY_BUCKETS)
+WAITING = Gauge("backend_waiting", "Calls currently queued for a backend slot", ["backend"])
+for _name in BACKENDS:
+    WAITING.labels(backend=_name).set_function(lambda name=_name: _waiting[name])
+
+
+def get_client():
+    """Return the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            timeout=httpx.Timeout(30.0, connect=HTTP_CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def timeout_for(backend):
+    return httpx.Timeout(BACKENDS[backend]["timeout"], connect=HTTP_CONNECT_TIMEOUT)
+
+
+@asynccontextmanager
+async def limit(backend):
+    """Hold one of the backend's concurrency slots for the duration of the block."""
+    sem = _semaphores.get(backend)
+    if sem is None:
+        sem = _semaphores[backend] = asyncio.Semaphore(BACKENDS[backend]["concurrency"])
+    if sem.locked():
+        logger.info(f"{backend}: all {BACKENDS[backend]['concurrency']} slots busy, queueing "
+                    f"({_waiting[backend] + 1} waiting)")
+    _waiting[backend] += 1
+    start = time.perf_counter()
+    try:
+        await sem.acquire()
+    finally:
+        _waiting[backend] -= 1
+        QUEUE_SECONDS.labels(backend=backend).observe(time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+async def request(backend, method, url, **kwargs):
+    """Send a request through the shared pool, bounded by the backend's limits.
+
+    The current X-Request-ID is forwarded so the backend's logs can be joined
+    with ours.
+    """
+    kwargs.setdefault("timeout", timeout_for(backend))
+    kwargs["headers"] = {**telemetry.outgoing_headers(), **(kwargs.get("headers") or {})}
+    async with limit(backend):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            res = await get_client().request(method, url, **kwargs)
+            status = str(res.status_code)
+            return res
+        finally:
+            CALL_SECONDS.labels(backend=backend, status=status).observe(time.perf_counter() - start)
@@ -0,0 +1,382 @@
+"""Offline batch mode: run a corpus of recorded commands through the pipeline.
+
+Reads a directory of audio files or a JSONL manifest and runs every command
+through the same ASR -> routing/tools/LLM -> TTS code as /process, without the
+HTTP hop to the orchestrator. One JSON line per command is appended to --out
+as soon as it is done: transcript, intent, tool call and output, answer text,
+per-stage timings and, with --audio-dir, the path of the spoken reply.
+
+    python batch.py recordings/ --out results.jsonl
+    python batch.py manifest.jsonl --out results.jsonl --audio-dir replies/ --processes 4
+    python batch.py manifest.jsonl --out results.jsonl --asr-concurrency 4 --llm-concurrency 2
+
+Manifest lines look like {"id": ..., "audio": "clip.wav", "session": ..., "text": ...}.
+`audio` is relative to the manifest. `text` instead of `audio` skips ASR.
+Commands that share a `session` run in file order with one conversation
+context ("there", "delete it"); all others run independently.
+
+The output file is also the checkpoint: running again with the same --out skips
+every command that already has a result (--retry-errors redoes failed ones).
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import mimetypes
+import resource
+import multiprocessing
+from queue import Empty
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".ogg", ".opus", ".flac", ".m4a", ".webm"}
+REPLY_EXTENSIONS = {"audio/wav": ".wav", "audio/ogg": ".ogg", "audio/l16": ".pcm"}
+# Command-line stage -> backend whose concurrency limit it sets (see backends.BACKENDS)
+STAGE_LIMITS = {"asr": "WHISPER_CONCURRENCY", "llm": "OLLAMA_CONCURRENCY", "tts": "TTS_CONCURRENCY"}
+
+
+# --- Input ---
+def load_jobs(path):
+    """Commands from a directory (every audio file, recursively) or a JSONL manifest."""
+    if os.path.isdir(path):
+        jobs = []
+        for root, _, files in os.walk(path):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    audio = os.path.join(root, name)
+                    jobs.append({"id": os.path.relpath(audio, path), "audio": audio})
+        return sorted(jobs, key=lambda job: job["id"])
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            if not job.get("audio") and not job.get("text"):
+                raise SystemExit(f"{path}:{number}: needs 'audio' or 'text'")
+            if job.get("audio"):
+                job["id"] = str(job.get("id") or job["audio"])
+                job["audio"] = os.path.join(base, job["audio"])
+            else:
+                job["id"] = str(job.get("id") or f"line-{number}")
+            jobs.append(job)
+    return jobs
+
+
+def group_jobs(jobs):
+    """Commands of one session stay together (and in order); the others are groups of one."""
+    groups = OrderedDict()
+    for job in jobs:
+        key = ("session", str(job["session"])) if job.get("session") is not None else ("job", job["id"])
+        groups.setdefault(key, []).append(job)
+    return list(groups.values())
+
+
+# --- Checkpoint ---
+def load_checkpoint(path, retry_errors=False):
+    """Results already in the output file: id -> record. The last record per id wins."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash: that command simply runs again
+                continue
+            done[record["id"]] = record
+    if retry_errors:
+        done = {job_id: record for job_id, record in done.items() if record.get("status") == "ok"}
+    return done
+
+
+def plan(groups, done):
+    """Groups that still have work, each with the saved contexts of its finished commands."""
+    pending = []
+    for jobs in groups:
+        if all(job["id"] in done for job in jobs):
+            continue
+        contexts = {job["id"]: done[job["id"]].get("context") for job in jobs if job["id"] in done}
+        pending.append({"jobs": jobs, "done": contexts})
+    return pending
+
+
+def shard(groups, count):
+    """Spread the groups over `count` workers, balancing the number of commands."""
+    shards = [[] for _ in range(count)]
+    sizes = [0] * count
+    for group in groups:
+        index = sizes.index(min(sizes))
+        shards[index].append(group)
+        sizes[index] += len(group["jobs"]) - len(group["done"])
+    return [s for s in shards if s]
+
+
+# --- Pipeline ---
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def reply_path(audio_dir, job_id, media_type):
+    stem, ext = os.path.splitext(job_id)
+    name = re.sub(r"[^\w.-]+", "_", stem if ext.lower() in AUDIO_EXTENSIONS else job_id)
+    return os.path.join(audio_dir, name + REPLY_EXTENSIONS.get(media_type.split(";")[0].lower(), ".bin"))
+
+
+async def process_job(pipeline, job, context, options, io_pool):
+    """Run one command; never raises, failures end up in the record."""
+    telemetry = pipeline.telemetry
+    request_id = uuid.uuid4().hex
+    telemetry.request_id_var.set(request_id)
+    telemetry.timings_var.set([])
+    loop = asyncio.get_running_loop()
+    record = {"id": job["id"], "audio": job.get("audio"), "session": job.get("session"),
+              "request_id": request_id, "transcript": None, "intent": None, "tool": None,
+              "tool_input": None, "tool_output": None, "answer": None}
+    start = time.perf_counter()
+    try:
+        if job.get("text"):
+            transcript = job["text"]
+        else:
+            with telemetry.stage("upload_read"):
+                data = await loop.run_in_executor(io_pool, read_file, job["audio"])
+            content_type = mimetypes.guess_type(job["audio"])[0] or "application/octet-stream"
+            upload = pipeline.AudioUpload(os.path.basename(job["audio"]), content_type, body=data)
+            transcript = await pipeline.transcribe(upload)
+        record["transcript"] = transcript
+
+        if transcript:
+            trace = {}
+            record["answer"] = await pipeline.answer(transcript, context, trace)
+            record.update(trace)
+            if options["audio_dir"]:
+                audio, media_type, _ = await pipeline.synthesize(record["answer"], options["accept"])
+                path = reply_path(options["audio_dir"], job["id"], media_type)
+                await loop.run_in_executor(io_pool, write_file, path, audio)
+                record["reply_audio"] = path
+        record["status"] = "ok"
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["timings"] = {label: round(seconds, 4) for label, seconds in telemetry.labeled_timings()}
+    record["total_seconds"] = round(time.perf_counter() - start, 4)
+    # Lets a resumed run continue the session where this command left it
+    record["context"] = context.dumps()
+    return record
+
+
+async def run_shard(groups, options, emit):
+    """Run groups concurrently (at most options["concurrency"] at a time) and emit every record."""
+    # Imported here so the stage limits from the command line are in the environment first
+    import main as pipeline
+    from context_store import AssistantContext
+
+    io_pool = ThreadPoolExecutor(max_workers=options["io_threads"], thread_name_prefix="batch-io")
+    slots = asyncio.Semaphore(options["concurrency"])
+
+    async def run_group(group):
+        async with slots:
+            context = AssistantContext()
+            for job in group["jobs"]:
+                if job["id"] in group["done"]:
+                    saved = group["done"][job["id"]]
+                    context = AssistantContext.loads(saved) if saved else AssistantContext()
+                    continue
+                emit(await process_job(pipeline, job, context, options, io_pool))
+
+    try:
+        await asyncio.gather(*(run_group(group) for group in groups))
+    finally:
+        await pipeline.backends.close_client()
+        io_pool.shutdown()
+
+
+def run_worker(groups, options, results):
+    """Entry point of a worker process: its own event loop and backend limits, results via a queue."""
+    logging.basicConfig(level=logging.INFO if options["verbose"] else logging.WARNING)
+    asyncio.run(run_shard(groups, options, results.put))
+
+
+# --- Output ---
+def percentile(values, q):
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class ResultWriter:
+    """Appends records to the output JSONL (flushed per line) and keeps what the report needs."""
+
+    def __init__(self, path, total, progress_every=50):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "a+", encoding="utf-8")
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell():
+            # Finish a line cut short by a crash, so the next record starts on its own line
+            self.file.seek(self.file.tell() - 1)
+            if self.file.read(1) != "\n":
+                self.file.write("\n")
+        self.total = total
+        self.progress_every = progress_every
+        self.count = 0
+        self.errors = 0
+        self.stage_seconds = {}
+        self.total_seconds = []
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.count += 1
+        if record["status"] != "ok":
+            self.errors += 1
+            print(f"{record['id']}: {record.get('error')}", file=sys.stderr)
+        else:
+            self.total_seconds.append(record["total_seconds"])
+            per_stage = {}
+            for label, seconds in record["timings"].items():
+                # llm_chat-2 counts towards llm_chat
+                name = label.rsplit("-", 1)[0]
+                per_stage[name] = per_stage.get(name, 0.0) + seconds
+            for name, seconds in per_stage.items():
+                self.stage_seconds.setdefault(name, []).append(seconds)
+        if self.count % self.progress_every == 0 or self.count == self.total:
+            print(f"{self.count}/{self.total} commands done ({self.errors} errors)", file=sys.stderr)
+
+    def close(self):
+        self.file.close()
+
+
+def cpu_seconds():
+    """CPU time of this process and its finished children (the worker processes)."""
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def build_report(writer, skipped, wall, cpu, args):
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    throughput = writer.count / wall if wall else 0.0
+
+    def summarize(values):
+        return {"count": len(values), "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1)}
+
+    return {
+        "config": {"processes": args.processes, "concurrency": args.concurrency,
+                   "limits": {stage: getattr(args, f"{stage}_concurrency") for stage in STAGE_LIMITS}},
+        "processed": writer.count,
+        "errors": writer.errors,
+        "skipped": skipped,
+        "wall_seconds": round(wall, 2),
+        "throughput_per_second": round(throughput, 3),
+        "cpu_cores": cores,
+        "throughput_per_core": round(throughput / cores, 3),
+        # Orchestrator-side CPU only: Whisper, TTS and Ollama run in their own services
+        "cpu_seconds": round(cpu, 2),
+        "commands_per_cpu_second": round(writer.count / cpu, 3) if cpu else 0.0,
+        "end_to_end": summarize(writer.total_seconds) if writer.total_seconds else {},
+        "stages": {name: summarize(values) for name, values in sorted(writer.stage_seconds.items())},
+    }
+
+
+def print_report(report):
+    print(f"\nProcessed {report['processed']} commands ({report['errors']} errors, "
+          f"{report['skipped']} skipped from the checkpoint) in {report['wall_seconds']} s")
+    print(f"Throughput: {report['throughput_per_second']} commands/s, "
+          f"{report['throughput_per_core']} per CPU core ({report['cpu_cores']} cores), "
+          f"{report['commands_per_cpu_second']} per orchestrator CPU second")
+    print(f"{'':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    rows = ([("end-to-end", report["end_to_end"])] if report["end_to_end"] else []) + \
+        [(f"timing: {name}", s) for name, s in report["stages"].items()]
+    for name, s in rows:
+        print(f"{name:<18}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}")
+
+
+# --- Main ---
+def run(args):
+    jobs = load_jobs(args.input)
+    ids = [job["id"] for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise SystemExit("Command ids must be unique (they are the checkpoint keys)")
+    done = load_checkpoint(args.out, args.retry_errors)
+    groups = plan(group_jobs(jobs), done)
+    todo = sum(len(group["jobs"]) - len(group["done"]) for group in groups)
+    skipped = len(jobs) - todo
+    print(f"{len(jobs)} commands, {skipped} already in {args.out}, {todo} to run", file=sys.stderr)
+
+    # Stage limits are per process: split the totals over the workers
+    for stage, variable in STAGE_LIMITS.items():
+        limit = getattr(args, f"{stage}_concurrency")
+        if limit:
+            os.environ[variable] = str(max(1, limit // args.processes))
+    options = {"concurrency": max(1, args.concurrency // args.processes), "io_threads": args.io_threads,
+               "audio_dir": args.audio_dir, "accept": args.accept, "verbose": args.verbose}
+
+    writer = ResultWriter(args.out, todo)
+    start, cpu_start = time.perf_counter(), cpu_seconds()
+    try:
+        shards = shard(groups, args.processes)
+        if len(shards) <= 1:
+            asyncio.run(run_shard(shards[0] if shards else [], options, writer.write))
+        else:
+            # One event loop per process; the parent is the only writer of the output file
+            with multiprocessing.Manager() as manager, \
+                    ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = manager.Queue()
+                futures = [pool.submit(run_worker, s, options, results) for s in shards]
+                while not all(f.done() for f in futures) or not results.empty():
+                    try:
+                        writer.write(results.get(timeout=0.5))
+                    except Empty:
+                        pass
+                for future in futures:
+                    future.result()
+    finally:
+        writer.close()
+
+    report = build_report(writer, skipped, time.perf_counter() - start, cpu_seconds() - cpu_start, args)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if writer.errors else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory of audio files or JSONL manifest")
+    parser.add_argument("--out", required=True, help="results JSONL (appended to; also the checkpoint)")
+    parser.add_argument("--audio-dir", help="synthesize the answers and write them here")
+    parser.add_argument("--accept", default="audio/wav", help="audio format of the replies (audio/wav, audio/ogg)")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes, each with its own event loop")
+    parser.add_argument("--concurrency", type=int, default=16, help="commands in flight (over all processes)")
+    parser.add_argument("--asr-concurrency", type=int, help="Whisper calls in flight (default: WHISPER_CONCURRENCY)")
+    parser.add_argument("--llm-concurrency", type=int, help="LLM calls in flight (default: OLLAMA_CONCURRENCY)")
+    parser.add_argument("--tts-concurrency", type=int, help="TTS calls in flight (default: TTS_CONCURRENCY)")
+    parser.add_argument("--io-threads", type=int, default=4, help="threads per process for reading/writing audio")
+    parser.add_argument("--retry-errors", action="store_true", help="run failed commands of the checkpoint again")
+    parser.add_argument("--report", help="write the summary report to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's logs")
+    args = parser.parse_args(argv)
+    args.processes = max(1, args.processes)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    sys.exit(run(args))
@@ -0,0 +1,142 @@
+import time
+import json
+import bisect
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger("tools")
+
+
+def normalize_id(event_id):
+    """Event ids as one type: the API sends ints, the LLM may hand us "5"."""
+    try:
+        return int(event_id)
+    except (TypeError, ValueError):
+        return event_id
+
+
+def start_key(event):
+    """Sortable form of an event's start_time ('2025-01-12T09:00'); '' when missing."""
+    return (event.get("start_time") or "").replace(" ", "T")[:16]
+
+
+class CalendarMirror:
+    """Local copy of the team calendar, indexed by id and by start_time.
+
+    Reads are served from memory; the mirror resyncs lazily once it is older
+    than `ttl` seconds, using the server's ETag when it sends one and otherwise
+    skipping the rebuild if the payload did not change. Writes go to the API
+    first and are applied to the mirror only when they succeed (write-through).
+    Writes that land while a resync is fetching are applied again after the
+    rebuild, since the fetched payload may predate them.
+    """
+
+    def __init__(self, fetch_all, ttl=60):
+        self.fetch_all = fetch_all  # async (etag) -> (events or None if unchanged, etag)
+        self.ttl = ttl
+        self.by_id = {}
+        self.ids = []        # sorted event ids
+        self.by_start = []   # sorted (start_key, id)
+        self.synced_at = None
+        self.etag = None
+        self.digest = None
+        self.lock = asyncio.Lock()
+        self.writes_during_fetch = None  # list while a fetch is in flight
+
+    # --- Sync ---
+    def is_fresh(self):
+        return self.synced_at is not None and time.monotonic() - self.synced_at < self.ttl
+
+    async def ensure_fresh(self, force=False):
+        if self.is_fresh() and not force:
+            return
+        async with self.lock:
+            # Another request may have resynced while we were waiting
+            if self.is_fresh() and not force:
+                return
+            self.writes_during_fetch = []
+            try:
+                events, etag = await self.fetch_all(self.etag)
+            finally:
+                writes, self.writes_during_fetch = self.writes_during_fetch, None
+            self.synced_at = time.monotonic()
+            if events is None:
+                return  # 304 Not Modified
+            self.etag = etag
+            digest = hashlib.sha1(json.dumps(events, sort_keys=True).encode("utf-8")).hexdigest()
+            if digest != self.digest:
+                self.digest = digest
+                self._rebuild(events)
+                for write, arg in writes:
+                    # A delete the payload already reflects is no reason to resync again
+                    if write != self.remove or self.has(arg):
+                        write(arg)
+                logger.info(f"Calendar mirror resynced: {len(self.ids)} events"
+                            f"{f', {len(writes)} concurrent writes reapplied' if writes else ''}")
+
+    def invalidate(self):
+        self.synced_at = None
+
+    def _rebuild(self, events):
+        self.by_id = {normalize_id(e["id"]): {**e, "id": normalize_id(e["id"])} for e in events if "id" in e}
+        self.ids = sorted(self.by_id)
+        self.by_start = sorted((start_key(e), i) for i, e in self.by_id.items())
+
+    # --- Write-through ---
+    def upsert(self, event):
+        event_id = normalize_id(event["id"])
+        event = {**event, "id": event_id}
+        if self.writes_during_fetch is not None:
+            self.writes_during_fetch.append((self.upsert, event))
+        old = self.by_id.get(event_id)
+        if old is not None:
+            self._unindex_start(old)
+            event = {**old, **event}
+        else:
+            bisect.insort(self.ids, event_id)
+        self.by_id[event_id] = event
+        bisect.insort(self.by_start, (start_key(event), event_id))
+        self.digest = None  # local state no longer matches the last payload
+
+    def remove(self, event_id):
+        event_id = normalize_id(event_id)
+        if self.writes_during_fetch is not None:
+            self.writes_during_fetch.append((self.remove, event_id))
+        event = self.by_id.pop(event_id, None)
+        if event is None:
+            # Deleted upstream but unknown here: the mirror is out of date
+            self.invalidate()
+            return
+        del self.ids[bisect.bisect_left(self.ids, event_id)]
+        self._unindex_start(event)
+        self.digest = None
+
+    def _unindex_start(self, event):
+        entry = (start_key(event), event["id"])
+        pos = bisect.bisect_left(self.by_start, entry)
+        if pos < len(self.by_start) and self.by_start[pos] == entry:
+            del self.by_start[pos]
+
+    # --- Queries ---
+    def has(self, event_id):
+        return normalize_id(event_id) in self.by_id
+
+    def events(self):
+        """All events ordered by id."""
+        return [self.by_id[i] for i in self.ids]
+
+    def latest(self):
+        """Most recently created event (highest id)."""
+        return self.by_id[self.ids[-1]] if self.ids else None
+
+    def next_upcoming(self, now):
+        """First event starting at or after `now` ('YYYY-MM-DDTHH:MM')."""
+        pos = bisect.bisect_left(self.by_start, (now[:16],))
+        return self.by_id[self.by_start[pos][1]] if pos < len(self.by_start) else None
+
+    def between(self, start, end):
+        """Events with start <= start_time < end, ordered by start_time."""
+        lo = bisect.bisect_left(self.by_start, (start[:16],))
+        hi = bisect.bisect_left(self.by_start, (end[:16],))
+        return [self.by_id[i] for _, i in self.by_start[lo:hi]]
@@ -0,0 +1,176 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("context_store")
+
+# --- Configuration ---
+# "memory": per-process store (single worker). "redis": shared by every worker/replica.
+CONTEXT_STORE = os.getenv("CONTEXT_STORE", "memory")
+CONTEXT_REDIS_URL = os.getenv("CONTEXT_REDIS_URL", "redis://redis:6379/0")
+# Sessions idle for longer than this are forgotten
+CONTEXT_TTL_SECONDS = float(os.getenv("CONTEXT_TTL_SECONDS", "3600"))
+# Memory bound of the in-process store; least recently used sessions are evicted first
+CONTEXT_MAX_SESSIONS = int(os.getenv("CONTEXT_MAX_SESSIONS", "10000"))
+DEFAULT_CITY = os.getenv("DEFAULT_CITY", "Marburg")
+
+SESSION_HEADER = "X-Session-ID"
+SESSION_COOKIE = "session_id"
+
+
+class AssistantContext:
+    """What the assistant remembers about one conversation."""
+    __slots__ = ("last_city", "last_event_id")
+
+    def __init__(self, last_city=DEFAULT_CITY, last_event_id=None):
+        self.last_city = last_city
+        self.last_event_id = last_event_id
+
+    def update_context(self, city=None, event_id=None):
+        if city: self.last_city = city
+        if event_id: self.last_event_id = event_id
+
+    # Compact wire format for shared backends: "city|event_id"
+    def dumps(self):
+        return f"{self.last_city}|{self.last_event_id or ''}"
+
+    @classmethod
+    def loads(cls, raw):
+        city, _, event_id = raw.rpartition("|")
+        return cls(city or DEFAULT_CITY, int(event_id) if event_id else None)
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def session_id_from(headers, cookies):
+    """Session id sent by the client (header first, then cookie), or None."""
+    session_id = (headers.get(SESSION_HEADER) or cookies.get(SESSION_COOKIE) or "").strip()
+    # Ids are opaque, but bound them so a client cannot blow up the store's keys
+    return session_id[:128] or None
+
+
+class MemoryContextStore:
+    """In-process LRU of session contexts with an idle TTL.
+
+    Records are (expires_at, "city|event_id") tuples, so 10,000 sessions cost
+    around a megabyte.
+    """
+
+    def __init__(self, max_sessions=CONTEXT_MAX_SESSIONS, ttl=CONTEXT_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def load(self, session_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is not None and entry[0] <= now:
+                del self.entries[session_id]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return AssistantContext()
+            self.hits += 1
+            self.entries.move_to_end(session_id)
+            return AssistantContext.loads(entry[1])
+
+    async def save(self, session_id, context):
+        with self.lock:
+            self.entries[session_id] = (time.monotonic() + self.ttl, context.dumps())
+            self.entries.move_to_end(session_id)
+            while len(self.entries) > self.max_sessions:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    async def close(self):
+        pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self.entries),
+                "max_sessions": self.max_sessions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class RedisContextStore:
+    """Contexts shared by all workers and replicas through Redis.
+
+    One string key per session with the TTL refreshed on every save. Size the
+    server with `maxmemory` and `maxmemory-policy allkeys-lru` for the memory
+    bound. A `fakeredis://` URL selects the in-process fakeredis stand-in
+    (local runs and the load test).
+    """
+
+    def __init__(self, url=CONTEXT_REDIS_URL, ttl=CONTEXT_TTL_SECONDS, prefix="ctx:"):
+        if url.startswith("fakeredis://"):
+            import fakeredis
+            self.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        else:
+            import redis.asyncio
+            self.client = redis.asyncio.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def load(self, session_id):
+        try:
+            raw = await self.client.get(self.prefix + session_id)
+        except Exception as e:
+            # A Redis outage degrades to a fresh context instead of failing the request
+            self.errors += 1
+            logger.error(f"Context load failed: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return AssistantContext()
+        self.hits += 1
+        return AssistantContext.loads(raw)
+
+    async def save(self, session_id, context):
+        try:
+            await self.client.set(self.prefix + session_id, context.dumps(), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Context save failed: {e}")
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_store(kind=CONTEXT_STORE):
+    if kind == "redis":
+        logger.info(f"Context store: redis ({CONTEXT_REDIS_URL})")
+        return RedisContextStore()
+    if kind != "memory":
+        raise ValueError(f"Unknown CONTEXT_STORE '{kind}' (expected 'memory' or 'redis')")
+    return MemoryContextStore()
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from ttl_cache import TTLCache
+
+logger = logging.getLogger("tools")
+
+
+def place_key(city):
+    return " ".join(city.strip().strip("'").strip('"').lower().split())
+
+
+def parse_forecast(payload, city):
+    """Turn the raw weather.php payload into the structure every reader uses.
+
+    {"place": "Marburg", "days": {"monday": {"weather": ..., "max": ..., "min": ...}, ...}}
+    `days` keeps the API's order, so the first entry is the nearest day.
+    Returns None when the payload has no forecast.
+    """
+    forecasts = payload.get("forecast") or []
+    if not forecasts:
+        return None
+    days = OrderedDict()
+    for entry in forecasts:
+        temp = entry.get("temperature") or {}
+        days[entry.get("day", "").lower()] = {
+            "weather": entry.get("weather"),
+            "max": temp.get("max", "?"),
+            "min": temp.get("min", "?"),
+        }
+    place = (payload.get("place") or city).replace("&#039;", "'")  # Clean HTML entities
+    return {"place": place, "days": days}
+
+
+class ForecastCache:
+    """Per-place forecast cache with TTL, LRU bound and single-flight loading.
+
+    Concurrent lookups for the same place share one upstream call. Hot places
+    can be refreshed in the background so they are always served from memory.
+    """
+
+    def __init__(self, fetch, ttl=900, max_entries=256, hot_places=(), refresh_interval=0):
+        self.fetch = fetch  # async (city) -> parsed forecast or None
+        self.cache = TTLCache(ttl, max_entries)
+        self.hot_places = [p for p in hot_places if p]
+        self.refresh_interval = refresh_interval
+        self._refresher = None
+
+    async def get(self, city):
+        return await self.cache.get_or_load(place_key(city), lambda: self.fetch(city))
+
+    def is_cached(self, city):
+        """True if a lookup would be answered without (starting) an upstream call."""
+        return self.cache.is_cached(place_key(city))
+
+    # --- Background refresh for hot places ---
+    def start_refresh(self):
+        if self.refresh_interval > 0 and self.hot_places and self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop_refresh(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    async def _refresh_loop(self):
+        while True:
+            for city in self.hot_places:
+                try:
+                    forecast = await self.fetch(city)
+                    self.cache.put(place_key(city), forecast)
+                except Exception as e:
+                    logger.warning(f"Background forecast refresh failed for {city}: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self):
+        return self.cache.stats()
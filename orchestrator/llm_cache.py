@@ -0,0 +1,62 @@
+import os
+import re
+from ttl_cache import TTLCache
+
+# --- Policies ---
+# Extraction prompts (city name, calendar JSON) are deterministic for a given
+# utterance, so they are kept for long. Chat answers are free-form; a short TTL
+# only absorbs bursts of the same small talk. A TTL or size of 0 disables a cache.
+EXTRACTION_TTL = float(os.getenv("LLM_CACHE_EXTRACTION_TTL", "86400"))
+EXTRACTION_SIZE = int(os.getenv("LLM_CACHE_EXTRACTION_SIZE", "2048"))
+CHAT_TTL = float(os.getenv("LLM_CACHE_CHAT_TTL", "600"))
+CHAT_SIZE = int(os.getenv("LLM_CACHE_CHAT_SIZE", "256"))
+
+# Relative times ("in two hours", "now") resolve against the clock in the prompt,
+# so they cannot be served from a per-day calendar entry
+RELATIVE_TIME = re.compile(r"\b(?:now|right away|in (?:a|an|half an|\d+|\w+) (?:minutes?|hours?))\b")
+
+
+def normalize_utterance(text):
+    """'What's the weather, today?' -> "what's the weather today"."""
+    text = re.sub(r"[^\w\s':-]", " ", text.lower())
+    return " ".join(text.split())
+
+
+class ResponseCache(TTLCache):
+    """A named TTLCache of LLM results (raw text or parsed JSON params)."""
+
+    def __init__(self, name, ttl, max_entries):
+        super().__init__(ttl, max_entries)
+        self.name = name
+
+
+city = ResponseCache("city", EXTRACTION_TTL, EXTRACTION_SIZE)
+calendar = ResponseCache("calendar", EXTRACTION_TTL, EXTRACTION_SIZE)
+chat = ResponseCache("chat", CHAT_TTL, CHAT_SIZE)
+CACHES = [city, calendar, chat]
+
+
+# --- Keys ---
+# A key covers exactly what the prompt depends on besides fixed wording.
+def city_key(user_text):
+    return normalize_utterance(user_text)
+
+
+def calendar_key(user_text, now):
+    """Utterance + date bucket (the prompt carries the current date/time)."""
+    text = normalize_utterance(user_text)
+    if RELATIVE_TIME.search(text):
+        return None
+    return f"{now.strftime('%Y-%m-%d')}|{text}"
+
+
+def chat_key(user_text):
+    return normalize_utterance(user_text)
+
+
+def stats():
+    snapshot = {"entries": {}, "hits": {}, "misses": {}, "coalesced": {}, "hit_rate": {}}
+    for cache in CACHES:
+        for key, value in cache.stats().items():
+            snapshot[key][cache.name] = value
+    return snapshot
@@ -1,36 +1,70 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import Response
-import requests
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import Response, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
 import os
 import json
 import re
 import logging
 from datetime import datetime
 from langchain_ollama import ChatOllama
-from tools import get_weather, manage_calendar, format_weather_response
+from tools import get_weather, manage_calendar, format_weather_response, forecasts, calendar
+from streaming import SentenceSplitter, split_sentences, event, audio_event
+from replies import Reply
+import backends
+from router import router
+from temporal import parse_temporal
+import telemetry
+from telemetry import stage
+import context_store
+import speculation
+import llm_cache
+from forecast_cache import place_key
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("orchestrator")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    forecasts.start_refresh()
+    yield
+    await forecasts.stop_refresh()
+    await backends.close_client()
+    await contexts.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(telemetry.TelemetryMiddleware)
+telemetry.register_stats("router", router.stats.snapshot)
+telemetry.register_stats("forecast_cache", forecasts.stats)
+telemetry.register_stats("speculation", speculation.stats.snapshot)
+telemetry.register_stats("llm_cache", llm_cache.stats)
 
 # --- CONFIGURATION ---
 WHISPER_URL = os.getenv("WHISPER_URL", "http://whisper-service:8001")
 TTS_URL = os.getenv("TTS_URL", "http://tts-service:8002")
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
-llm = ChatOllama(model="gemma:2b", base_url=OLLAMA_URL)
+# Parsed calendar times at or above this confidence replace the LLM's start_time/end_time
+TEMPORAL_MIN_CONFIDENCE = float(os.getenv("TEMPORAL_MIN_CONFIDENCE", "0.75"))
+llm = ChatOllama(model="gemma:2b", base_url=OLLAMA_URL,
+                 client_kwargs={"timeout": backends.BACKENDS["ollama"]["timeout"]})
 
 # --- CONTEXT ---
-class AssistantContext:
-    def __init__(self):
-        self.last_city = "Marburg"
-        self.last_event_id = None
+# One AssistantContext per session (X-Session-ID header or session_id cookie)
+contexts = context_store.create_store()
+telemetry.register_stats("context_store", contexts.stats)
 
-    def update_context(self, city=None, event_id=None):
-        if city: self.last_city = city
-        if event_id: self.last_event_id = event_id
+def resolve_session(request):
+    """Return (session id, whether it was newly issued)."""
+    session_id = context_store.session_id_from(request.headers, request.cookies)
+    if session_id:
+        return session_id, False
+    return context_store.new_session_id(), True
 
-context = AssistantContext()
+def with_session(response, session_id, issued):
+    response.headers[context_store.SESSION_HEADER] = session_id
+    if issued:
+        response.set_cookie(context_store.SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
 
 def safe_extract_json(text):
     """Robustly parse JSON even with LLM filler text."""
@@ -38,71 +72,146 @@ def safe_extract_json(text):
         text = text.replace("'", '"')
         match = re.search(r'(\{.*\})', text, re.DOTALL)
         return json.loads(match.group(1)) if match else None
-    except: 
+    except:
         return None
 
-@app.post("/process")
-async def process_audio(file: UploadFile = File(...)):
-    logger.info(f"Processing audio file: {file.filename}")
-    
-    # 1. TRANSCRIBE
-    try:
-        audio_bytes = await file.read()
-        res_asr = requests.post(f"{WHISPER_URL}/transcribe", files={'file': (file.filename, audio_bytes, file.content_type)})
-        user_text = res_asr.json().get("text", "")
-        logger.info(f"Transcribed Text: {user_text}")
-    except Exception as e:
-        logger.error(f"Whisper Error: {e}")
-        return Response(content=b"", media_type="audio/wav")
+# ==========================================
+# PIPELINE STAGES
+# ==========================================
+class AudioUpload:
+    """The audio of one request: raw PCM still streaming in, or a file from a multipart form."""
+    __slots__ = ("filename", "content_type", "body", "stream")
 
-    if not user_text:
-        return Response(content=b"", media_type="audio/wav")
+    def __init__(self, filename, content_type, body=None, stream=None):
+        self.filename = filename
+        self.content_type = content_type
+        self.body = body
+        self.stream = stream
 
-    user_lower = user_text.lower()
-    final_answer = ""
+async def read_upload(request):
+    """Raw `audio/L16` bodies are not read here: they are piped to Whisper chunk by
+    chunk as they arrive. Multipart uploads (field `file`) are read as before."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.lower().startswith("audio/l16"):
+        return AudioUpload("audio.pcm", content_type, stream=request.stream())
+    with stage("upload_read"):
+        form = await request.form()
+        file = form.get("file")
+        if file is None or isinstance(file, str):
+            raise HTTPException(status_code=422, detail="Expected a multipart field 'file' or an audio/L16 body.")
+        return AudioUpload(file.filename, file.content_type, body=await file.read())
 
-    # ==========================================
-    # INTENT 1: WEATHER
-    # ==========================================
-    # INTENT: WEATHER (Hybrid Extraction)
-    if any(k in user_lower for k in ["weather", "rain", "temperature", "forecast"]):
-        # Deterministic check for required project cities
-        if "frankfurt" in user_lower:
-            city_name = "Frankfurt"
-        elif "marburg" in user_lower:
-            city_name = "Marburg"
-        elif "there" in user_lower or "that city" in user_lower:
-            # Resolve 'there' using conversation history (Requirement 66)
-            city_name = context.last_city
+async def transcribe(upload):
+    with stage("asr"):
+        if upload.stream is not None:
+            res_asr = await backends.request("whisper", "POST", f"{WHISPER_URL}/transcribe", content=upload.stream,
+                                             headers={"Content-Type": upload.content_type})
         else:
-            # Fallback to LLM for unknown cities
-            prompt = f"Extract ONLY the city name from: '{user_text}'. Return 'NONE' if no city found."
-            llm_res = llm.invoke(prompt).content.strip().replace(".", "")
-            city_name = llm_res if "NONE" not in llm_res.upper() else context.last_city
-
-        # Update memory and fetch data
-        context.update_context(city=city_name)
-        weather_data = get_weather(city_name, user_text)
-        
-        # If API succeeds, return formatted response; else error
-        if weather_data and not isinstance(weather_data, str):
-            final_answer = format_weather_response(weather_data, user_text)
-        else:
-            # Fallback if tools.py returned an error string
-            final_answer = str(weather_data) if weather_data else f"I couldn't find weather for {city_name}."
-        # INTENT 2: CALENDAR
-    # ==========================================
-    # Updated Calendar Intent Logic in main.py
-    elif any(k in user_lower for k in ["appointment", "meeting", "schedule", "delete", "list", "update", "change", "add", "where", "next"]):
-        logger.info("Intent: CALENDAR")
-        
-        is_next_query = any(k in user_lower for k in ["next", "where"]) and "appointment" in user_lower
-        now_str = datetime.now().strftime('%Y-%m-%dT%H:%M')
+            res_asr = await backends.request("whisper", "POST", f"{WHISPER_URL}/transcribe",
+                                             files={'file': (upload.filename, upload.body, upload.content_type)})
+    # A Whisper that is still loading answers 503: report it instead of an empty transcript
+    res_asr.raise_for_status()
+    return res_asr.json().get("text", "")
+
+async def synthesize(text, accept=None):
+    """Return (audio bytes, media type, seconds of audio or None).
+
+    `accept` is forwarded so clients can ask for Opus/PCM. A `Reply` is sent
+    as template segments.
+    """
+    headers = {"Accept": accept} if accept else None
+    payload = {"text": text}
+    if isinstance(text, Reply):
+        # Templated tool answer: fixed wording comes from the TTS cache, only the slots are rendered
+        payload["segments"] = text.segments
+    with stage("tts"):
+        res_tts = await backends.request("tts", "POST", f"{TTS_URL}/synthesize", json=payload, headers=headers)
+    res_tts.raise_for_status()
+    duration = res_tts.headers.get("x-audio-duration")
+    return res_tts.content, res_tts.headers.get("content-type", "audio/wav"), float(duration) if duration else None
+
+async def ask_llm(prompt, purpose="chat"):
+    """`purpose` names the Server-Timing/metrics stage: llm_city, llm_calendar, llm_chat."""
+    with stage(f"llm_{purpose}"):
+        async with backends.limit("ollama"):
+            return (await llm.ainvoke(prompt)).content
+
+async def stream_llm(prompt, purpose="chat"):
+    with stage(f"llm_{purpose}"):
+        async with backends.limit("ollama"):
+            async for chunk in llm.astream(prompt):
+                yield chunk.content
+
+# ==========================================
+# INTENT 1: WEATHER
+# ==========================================
+async def handle_weather(user_text, route, context, trace=None):
+    # INTENT: WEATHER (Hybrid Extraction)
+    if route.confident and "city" in route.slots:
+        # Deterministic gazetteer match (covers the required project cities)
+        city_name = route.slots["city"]
+    elif route.confident and route.slots.get("city_from_context"):
+        # Resolve 'there' (or no city at all) using conversation history (Requirement 66)
+        city_name = context.last_city
+    else:
+        # Fallback to LLM for unknown cities. Meanwhile fetch the forecast for the
+        # session's last city, which is also what a 'NONE' answer resolves to.
+        prefetch = speculation.prefetch_forecast(forecasts, context.last_city)
+        prompt = f"Extract ONLY the city name from: '{user_text}'. Return 'NONE' if no city found."
+        llm_res = await llm_cache.city.get_or_load(llm_cache.city_key(user_text), lambda: ask_llm(prompt, "city"))
+        llm_res = llm_res.strip().replace(".", "")
+        city_name = llm_res if "NONE" not in llm_res.upper() else context.last_city
+        if prefetch:
+            prefetch.settle(place_key(city_name) == prefetch.guess)
+    router.stats.record("weather", fast_path=route.confident)
+
+    # Update memory and fetch data
+    context.update_context(city=city_name)
+    with stage("weather"):
+        weather_data = await get_weather(city_name)
+    if trace is not None:
+        trace.update(tool="get_weather", tool_input={"city": city_name}, tool_output=weather_data)
+
+    # If API succeeds, return formatted response; else error
+    if weather_data and not isinstance(weather_data, str):
+        return format_weather_response(weather_data, user_text)
+    # Fallback if tools.py returned an error string
+    return weather_data or f"I couldn't find weather for {city_name}."
+
+# ==========================================
+# INTENT 2: CALENDAR
+# ==========================================
+# An update mentioning these changes more than the time and still needs the LLM
+UPDATE_FIELD_WORDS = ["title", "rename", "call it", "location", "place", "room", "where"]
+
+async def handle_calendar(user_text, route, context, trace=None):
+    logger.info("Intent: CALENDAR")
+    user_lower = user_text.lower()
+    is_next_query = route.slots.get("is_next_query", False)
+
+    action = route.slots.get("action")
+    span = (parse_temporal(user_text, event_id=route.slots.get("event_id"))
+            if action in ("create", "update", "list") else None)
+    time_known = span is not None and span.confidence >= TEMPORAL_MIN_CONFIDENCE
+    fast_path = route.confident or bool(time_known and (
+        (action == "create" and route.slots.get("title"))
+        or (action == "update" and not any(k in user_lower for k in UPDATE_FIELD_WORDS))))
+
+    prefetch = None
+    if fast_path:
+        # Everything the tool needs is in the router slots (+ the parsed time)
+        params = {k: v for k, v in route.slots.items() if k != "is_next_query"}
+    else:
+        # List / next / delete-latest flows read the mirror: resync it while the LLM runs
+        if action != "create" and (action is None or not context.last_event_id):
+            prefetch = speculation.prefetch_calendar(calendar)
+        now = datetime.now()
+        now_str = now.strftime('%Y-%m-%dT%H:%M')
         # Provide the last known ID to the LLM to help it decide if it should use it
         prompt = f"""
         Current Date/Time: {now_str}.
         User Request: "{user_text}"
-        
+
         Task: Extract JSON for calendar management.
         - action: "create", "list", "delete", "update"
         - title: the name of the event
@@ -112,14 +221,19 @@ async def process_audio(file: UploadFile = File(...)):
         - If the user says 'delete' or 'remove', action MUST be "delete".
         - If the user says 'add', 'create', or 'schedule', action MUST be "create".
         - If the user says 'list' or 'show', action MUST be "list".
-        
+
         JSON ONLY: {{"action": "create|list|delete|update", "title": "string", "start_time": "string", "location": "string", "event_id": int}}
         """
-        
-        llm_res = llm.invoke(prompt).content
-        params = safe_extract_json(llm_res) or {"action": "list"}
+
+        async def extract():
+            return safe_extract_json(await ask_llm(prompt, "calendar"))
+
+        # The parsed params are cached (per day), so a hit skips the LLM and the parsing.
+        # Copy: the overrides below must not leak into the cache.
+        cached = await llm_cache.calendar.get_or_load(llm_cache.calendar_key(user_text, now), extract)
+        params = dict(cached) if cached else {"action": "list"}
         logging.info(f"Parsed Calendar Params: {params}")
-        
+
         if any(k in user_lower for k in ["update", "change", "move"]):
             params["action"] = "update"
         elif any(k in user_lower for k in ["delete", "remove"]):
@@ -128,43 +242,238 @@ async def process_audio(file: UploadFile = File(...)):
             params["action"] = "list"
         elif any(k in user_lower for k in ["add", "create", "schedule"]):
             params["action"] = "create"
-        
-        
-        # REQUIREMENT: Handle context for 'latest' ID when not provided (Slide 134)
-        if params.get("action") in ["delete", "update", "change"] and not params.get("event_id"):
-            params["event_id"] = context.last_event_id
-            logger.info(f"Using context ID for {params.get('action')}: {context.last_event_id}")
-
-        # Execute tool
-        tool_output = manage_calendar(is_next_query=is_next_query, **params)
-        
-        # REQUIREMENT: Update context with the ID of the newly created or latest appointment
-        id_match = re.search(r'ID (\d+)', str(tool_output))
-        if id_match:
-            context.update_context(event_id=int(id_match.group(1)))
-            
-        final_answer = str(tool_output)
-        
-      
-    # INTENT 3: CHAT
-    # ==========================================
-    else:
-        logger.info("Intent: CHAT")
-        final_answer = llm.invoke(f"Reply briefly: {user_text}").content
+    router.stats.record("calendar", fast_path=fast_path)
+
+    # Deterministic times win over the LLM's YYYY-MM-DDTHH:MM guess
+    if time_known and params.get("action") in ["create", "update"]:
+        params["start_time"], params["end_time"] = span.start_time, span.end_time
+    elif (span is not None and span.has_date and span.date_confidence >= TEMPORAL_MIN_CONFIDENCE
+          and params.get("action") == "list" and not is_next_query):
+        # The whole period that was named: one day for "tomorrow", Monday to Sunday for "next week"
+        params["range_start"], params["range_end"] = span.range_start, span.range_end
+
+    # REQUIREMENT: Handle context for 'latest' ID when not provided (Slide 134)
+    if params.get("action") in ["delete", "update", "change"] and not params.get("event_id"):
+        params["event_id"] = context.last_event_id
+        logger.info(f"Using context ID for {params.get('action')}: {context.last_event_id}")
+
+    if prefetch:
+        final_action = params.get("action")
+        prefetch.settle(final_action == "list" or (final_action in ["delete", "update", "change"]
+                                                   and not params.get("event_id")))
+
+    # Execute tool
+    with stage("calendar"):
+        tool_output = await manage_calendar(is_next_query=is_next_query, **params)
+    if trace is not None:
+        trace.update(tool="manage_calendar", tool_input=dict(params, is_next_query=is_next_query),
+                     tool_output=str(tool_output))
+
+    # REQUIREMENT: Update context with the ID of the newly created or latest appointment
+    id_match = re.search(r'ID (\d+)', str(tool_output))
+    if id_match:
+        context.update_context(event_id=int(id_match.group(1)))
+
+    return tool_output
 
+# ==========================================
+# INTENT 3: CHAT
+# ==========================================
+def chat_prompt(user_text):
+    return f"Reply briefly: {user_text}"
+
+async def answer(user_text, context, trace=None):
+    """Run intent routing and the matching tool/LLM call, return the final answer text.
+
+    `trace` (optional dict) receives the intent and the tool call: tool, tool_input, tool_output.
+    """
+    with stage("route"):
+        route = router.route(user_text)
+    logger.info(f"Route: {route}")
+    if trace is not None:
+        trace.update(intent=route.intent, router_confident=route.confident)
+    if route.intent == "weather":
+        return await handle_weather(user_text, route, context, trace)
+    if route.intent == "calendar":
+        return await handle_calendar(user_text, route, context, trace)
+    logger.info("Intent: CHAT")
+    return await llm_cache.chat.get_or_load(llm_cache.chat_key(user_text), lambda: ask_llm(chat_prompt(user_text)))
+
+@app.post("/process")
+async def process_audio(request: Request, accept: str = Header(None)):
+    """Audio in (multipart field `file`, or a raw `audio/L16; rate=16000` body), spoken answer out."""
+    session_id, issued = resolve_session(request)
+    upload = await read_upload(request)
+    logger.info(f"Processing audio file: {upload.filename} (request {telemetry.current_request_id()})")
+
+    # 1. TRANSCRIBE
+    try:
+        user_text = await transcribe(upload)
+        logger.info(f"Transcribed Text: {user_text}")
+    except Exception as e:
+        logger.error(f"Whisper Error: {e}")
+        return with_session(Response(content=b"", media_type="audio/wav",
+                                     headers={"Server-Timing": telemetry.server_timing()}), session_id, issued)
+
+    if not user_text:
+        return with_session(Response(content=b"", media_type="audio/wav",
+                                     headers={"Server-Timing": telemetry.server_timing()}), session_id, issued)
+
+    # 2. ROUTE + ANSWER
+    context = await contexts.load(session_id)
+    final_answer = await answer(user_text, context)
+    await contexts.save(session_id, context)
     logger.info(f"Final Answer: {final_answer}")
 
     # 3. SYNTHESIZE
     try:
-        res_tts = requests.post(f"{TTS_URL}/synthesize", json={"text": final_answer})
-        return Response(
-            content=res_tts.content, 
-            media_type="audio/wav", 
+        audio, media_type, _ = await synthesize(final_answer, accept)
+        return with_session(Response(
+            content=audio,
+            media_type=media_type,
             headers={
-                "X-Response-Text": final_answer.replace("\n", " ").strip(), 
-                "X-User-Text": user_text.replace("\n", " ").strip()
+                "X-Response-Text": final_answer.replace("\n", " ").strip(),
+                "X-User-Text": user_text.replace("\n", " ").strip(),
+                "Server-Timing": telemetry.server_timing(),
             }
-        )
+        ), session_id, issued)
     except Exception as e:
         logger.error(f"TTS Error: {e}")
-        return Response(status_code=500)
\ No newline at end of file
+        return with_session(Response(status_code=500), session_id, issued)
+
+# ==========================================
+# STREAMING MODE
+# ==========================================
+async def answer_sentences(user_text, context):
+    """Yield the answer sentence by sentence.
+
+    Chat answers are streamed token by token from the LLM, so the first sentence
+    is available long before generation ends. Tool answers are produced in one
+    go and only split.
+    """
+    with stage("route"):
+        route = router.route(user_text)
+    logger.info(f"Route: {route}")
+    if route.intent == "weather":
+        for sentence in split_sentences(await handle_weather(user_text, route, context)):
+            yield sentence
+        return
+    if route.intent == "calendar":
+        for sentence in split_sentences(await handle_calendar(user_text, route, context)):
+            yield sentence
+        return
+
+    logger.info("Intent: CHAT (streaming)")
+    key = llm_cache.chat_key(user_text)
+    cached = llm_cache.chat.get(key)
+    if cached is not None:
+        for sentence in split_sentences(cached):
+            yield sentence
+        return
+
+    if llm_cache.chat.enabled:
+        llm_cache.chat.record_miss()
+    splitter = SentenceSplitter()
+    tokens = []
+    async for token in stream_llm(chat_prompt(user_text)):
+        tokens.append(token)
+        for sentence in splitter.feed(token):
+            yield sentence
+    rest = splitter.flush()
+    if rest:
+        yield rest
+    llm_cache.chat.put(key, "".join(tokens))
+
+async def stream_events(user_text, session_id, accept=None):
+    """Produce NDJSON events, synthesizing each sentence as soon as it is complete.
+
+    Each sentence is synthesized in its own task (bounded by the TTS backend
+    limit), so sentence N is rendered while the LLM is still generating
+    sentence N+1. The loop waits on the next sentence and the oldest pending
+    audio together, so audio goes out as soon as TTS finishes, strictly in order.
+    """
+    yield event("transcript", text=user_text)
+
+    pending = []  # (index, task) in sentence order
+    sentences = []
+    source = None
+    next_sentence = None
+
+    try:
+        context = await contexts.load(session_id)
+        source = answer_sentences(user_text, context)
+        next_sentence = asyncio.ensure_future(anext(source))
+        while next_sentence or pending:
+            waiting = [task for task in (next_sentence, pending[0][1] if pending else None) if task]
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            while pending and pending[0][1].done():
+                index, task = pending.pop(0)
+                try:
+                    audio, media_type, duration = task.result()
+                    yield audio_event(index, audio, media_type, duration)
+                except Exception as e:
+                    logger.error(f"TTS Error (sentence {index}): {e}")
+                    yield event("error", index=index, message="Speech synthesis failed.")
+
+            if next_sentence and next_sentence.done():
+                try:
+                    sentence = next_sentence.result()
+                except StopAsyncIteration:
+                    next_sentence = None
+                    # The answer is complete; persist the context before waiting for the remaining audio
+                    await contexts.save(session_id, context)
+                    continue
+                index = len(sentences)
+                sentences.append(sentence)
+                yield event("text", index=index, text=sentence)
+                pending.append((index, asyncio.create_task(synthesize(sentence, accept))))
+                next_sentence = asyncio.ensure_future(anext(source))
+    except Exception as e:
+        logger.error(f"Streaming Error: {e}")
+        yield event("error", message="The assistant could not finish the answer.")
+    finally:
+        # Client disconnected or generation failed: drop outstanding generation and synthesis work
+        for _, task in pending:
+            task.cancel()
+        if next_sentence and not next_sentence.done():
+            # Cancelling the running step also ends the generator
+            next_sentence.cancel()
+        elif source is not None:
+            await source.aclose()
+
+    final_answer = " ".join(sentences)
+    logger.info(f"Final Answer (streamed): {final_answer}")
+    # Headers are long gone by now, so the stage breakdown travels in the last event
+    yield event("done", text=final_answer, timings=telemetry.server_timing())
+
+@app.post("/process/stream")
+async def process_audio_stream(request: Request, x_audio_format: str = Header(None)):
+    session_id, issued = resolve_session(request)
+    upload = await read_upload(request)
+    logger.info(f"Processing audio file (stream): {upload.filename} (request {telemetry.current_request_id()})")
+
+    try:
+        user_text = await transcribe(upload)
+        logger.info(f"Transcribed Text: {user_text}")
+    except Exception as e:
+        logger.error(f"Whisper Error: {e}")
+        raise HTTPException(status_code=502, detail="Transcription failed.")
+
+    if not user_text:
+        return with_session(StreamingResponse(iter([event("done", text="")]), media_type="application/x-ndjson"),
+                            session_id, issued)
+
+    return with_session(StreamingResponse(stream_events(user_text, session_id, x_audio_format),
+                                          media_type="application/x-ndjson"), session_id, issued)
+
+@app.get("/router/stats")
+async def router_stats():
+    """How often intent/slot extraction skipped the LLM."""
+    return router.stats.snapshot()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: request/stage/backend histograms plus cache and router stats."""
+    payload, content_type = telemetry.metrics_payload()
+    return Response(content=payload, media_type=content_type)
@@ -0,0 +1,54 @@
+import re
+
+# --- Templated Replies ---
+# Tool answers are templates: fixed wording around a few values (city, temperature,
+# appointment title). A Reply is the finished answer text (a str, so it flows
+# through answer(), traces and headers unchanged) that also remembers its parts.
+# synthesize() sends them to the TTS service as segments: the fixed wording is
+# served from its cache and only the slots are rendered.
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+# Punctuation that closes the previous part ("Marburg" + ": On Monday")
+LEADING_PUNCTUATION = re.compile(r'^[.,:;!?"\')\]]+')
+
+
+class Slot(str):
+    """A variable part of a template; rendered fresh, never cached by the TTS service."""
+
+
+class Reply(str):
+    parts = ()
+
+    @property
+    def segments(self):
+        """TTS segments: [{"text": ..., "cache": bool}]. Leading punctuation joins the part before it."""
+        segments = []
+        for part in self.parts:
+            text = part.strip()
+            closing = LEADING_PUNCTUATION.match(text)
+            if segments and closing:
+                segments[-1]["text"] += closing.group()
+                text = text[closing.end():].strip()
+            if text:
+                segments.append({"text": text, "cache": not isinstance(part, Slot)})
+        return segments
+
+    def sentences(self, min_chars=12):
+        """Split at parts that end a sentence; every piece keeps its own parts."""
+        pieces, current = [], []
+        for part in self.parts:
+            current.append(part)
+            text = "".join(current).strip()
+            if SENTENCE_END.search(part.strip()) and len(text) >= min_chars:
+                pieces.append(reply(*current))
+                current = []
+        if "".join(current).strip():
+            pieces.append(reply(*current))
+        return pieces
+
+
+def reply(*parts):
+    """reply("Deleted appointment ID ", Slot(7), ".") -> Reply("Deleted appointment ID 7.")"""
+    parts = [part if isinstance(part, str) else Slot(part) for part in parts]
+    result = Reply("".join(parts).strip())
+    result.parts = parts
+    return result
@@ -0,0 +1,242 @@
+import os
+import re
+import logging
+from collections import deque
+
+logger = logging.getLogger("orchestrator")
+
+# Below this confidence the orchestrator falls back to the LLM for extraction
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.75"))
+# Optional newline-separated list of extra place names for the gazetteer
+CITY_GAZETTEER = os.getenv("CITY_GAZETTEER", "")
+
+# Inflections accepted after a keyword ("appointments", "deleted", "scheduling")
+SUFFIXES = ("", "s", "es", "d", "ed", "ing")
+
+# keyword -> (intent, label). Calendar labels are the action they imply.
+KEYWORDS = {
+    "weather": ("weather", None), "rain": ("weather", None), "temperature": ("weather", None),
+    "forecast": ("weather", None), "sunny": ("weather", None), "snow": ("weather", None),
+    "appointment": ("calendar", None), "meeting": ("calendar", None), "calendar": ("calendar", None),
+    "update": ("calendar", "update"), "change": ("calendar", "update"), "move": ("calendar", "update"),
+    "delete": ("calendar", "delete"), "remove": ("calendar", "delete"), "cancel": ("calendar", "delete"),
+    "list": ("calendar", "list"), "show": ("calendar", "list"), "where": ("calendar", "list"),
+    "find": ("calendar", "list"), "next": ("calendar", "list"),
+    "add": ("calendar", "create"), "create": ("calendar", "create"), "schedule": ("calendar", "create"),
+    "there": ("reference", "city"), "that city": ("reference", "city"),
+}
+# Same precedence as the keyword override in the calendar handler
+ACTION_PRIORITY = ["update", "delete", "list", "create"]
+# Words that only make sense for the calendar when the sentence is about appointments
+WEAK_CALENDAR_WORDS = {"where", "find", "next", "show"}
+
+PLACES = [
+    "Marburg", "Frankfurt", "Frankfurt am Main", "Berlin", "Hamburg", "Munich", "München", "Cologne",
+    "Köln", "Stuttgart", "Düsseldorf", "Dortmund", "Essen", "Leipzig", "Bremen", "Dresden", "Hanover",
+    "Hannover", "Nuremberg", "Nürnberg", "Duisburg", "Bochum", "Wuppertal", "Bonn", "Münster",
+    "Mannheim", "Karlsruhe", "Wiesbaden", "Mainz", "Darmstadt", "Kassel", "Gießen", "Giessen",
+    "Heidelberg", "Freiburg", "Augsburg", "Aachen", "Kiel", "Lübeck", "Rostock", "Erfurt", "Jena",
+    "Göttingen", "Offenbach", "Fulda", "Würzburg", "Regensburg", "Ulm", "Trier", "Saarbrücken",
+    "London", "Paris", "Madrid", "Barcelona", "Rome", "Milan", "Vienna", "Zurich", "Geneva", "Amsterdam",
+    "Brussels", "Prague", "Warsaw", "Copenhagen", "Stockholm", "Oslo", "Helsinki", "Dublin", "Lisbon",
+    "Athens", "Istanbul", "Budapest", "New York", "Los Angeles", "San Francisco", "Chicago", "Boston",
+    "Washington", "Toronto", "Vancouver", "Mexico City", "Tokyo", "Beijing", "Shanghai", "Hong Kong",
+    "Singapore", "Seoul", "Delhi", "New Delhi", "Mumbai", "Bangalore", "Kochi", "Chennai", "Dubai",
+    "Sydney", "Melbourne", "Cairo", "Cape Town", "Nairobi", "São Paulo", "Rio de Janeiro", "Buenos Aires",
+]
+
+# "in Springfield", "for Springfield": a place we do not know, needs the LLM
+UNKNOWN_PLACE = re.compile(r"\b(?:in|for|at|of)\s+([a-z][a-z'\-]+)")
+NOT_PLACES = {"the", "a", "my", "this", "that", "today", "tomorrow", "morning", "afternoon", "evening",
+              "night", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+              "general", "there", "it", "weekend", "week", "next", "degrees", "celsius", "fahrenheit"}
+# "titled Team Meeting for ...", "called 'Dentist' tomorrow"
+TITLE = re.compile(r"\b(?:titled|called|named)\s+[\"']?(.+?)[\"']?"
+                   r"(?=\s+(?:for|on|at|from|tomorrow|today|tonight|next|this|in|with)\b|[.?!]?$)")
+# The "next" of "next week" / "next Tuesday" is part of a date, not a request for the next appointment
+NEXT_DATE = re.compile(r"\bnext(?=\s+(?:week|month|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b)")
+EVENT_ID = re.compile(r"\b(?:id|appointment|meeting|number)\s*(?:number\s*)?#?\s*(\d+)\b")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: finds every keyword in one pass over the text."""
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for word in keywords:
+            state = 0
+            for ch in word:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.out[state].append(word)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text):
+        """Yield (start, end, keyword) for whole-word matches (inflections allowed)."""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for word in self.out[state]:
+                start = i - len(word) + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                end = i + 1
+                tail = end
+                while tail < len(text) and text[tail].isalpha():
+                    tail += 1
+                if text[end:tail] in SUFFIXES:
+                    yield start, end, word
+
+
+class Gazetteer:
+    """Token trie of place names; returns the longest known place in a text."""
+
+    def __init__(self, names):
+        self.root = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        node = self.root
+        for token in name.lower().split():
+            node = node.setdefault(token, {})
+        node["$"] = name
+
+    def find(self, text):
+        tokens = re.findall(r"[\w'\-]+", text.lower())
+        best = None
+        for i in range(len(tokens)):
+            node = self.root
+            for token in tokens[i:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if "$" in node and (best is None or len(node["$"]) > len(best)):
+                    best = node["$"]
+        return best
+
+
+class Route:
+    __slots__ = ("intent", "slots", "confidence")
+
+    def __init__(self, intent, slots=None, confidence=1.0):
+        self.intent = intent
+        self.slots = slots or {}
+        self.confidence = confidence
+
+    @property
+    def confident(self):
+        return self.confidence >= ROUTER_MIN_CONFIDENCE
+
+    def __repr__(self):
+        return f"Route({self.intent}, {self.slots}, {self.confidence:.2f})"
+
+
+class RouterStats:
+    """Counts how often extraction was answered by the router vs. the LLM."""
+
+    def __init__(self):
+        self.fast_path = {}
+        self.llm = {}
+
+    def record(self, intent, fast_path):
+        counter = self.fast_path if fast_path else self.llm
+        counter[intent] = counter.get(intent, 0) + 1
+
+    def snapshot(self):
+        fast, slow = sum(self.fast_path.values()), sum(self.llm.values())
+        return {
+            "fast_path": dict(self.fast_path),
+            "llm": dict(self.llm),
+            "fast_path_rate": round(fast / (fast + slow), 4) if fast + slow else 0.0,
+        }
+
+
+class Router:
+    """Deterministic intent + slot extraction that runs before any LLM call."""
+
+    def __init__(self, places=PLACES):
+        self.automaton = KeywordAutomaton(KEYWORDS)
+        self.gazetteer = Gazetteer(places)
+        self.stats = RouterStats()
+
+    def load_gazetteer(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self.gazetteer.add(line.strip())
+
+    def route(self, text):
+        lower = text.lower()
+        hits = [KEYWORDS[word] + (word,) for _, _, word in self.automaton.find(NEXT_DATE.sub("", lower))]
+        intents = {intent for intent, _, _ in hits}
+
+        if "weather" in intents:
+            return self._route_weather(lower, hits)
+        if "calendar" in intents:
+            calendar_route = self._route_calendar(text, lower, hits)
+            if calendar_route:
+                return calendar_route
+        return Route("chat")
+
+    def _route_weather(self, lower, hits):
+        city = self.gazetteer.find(lower)
+        if city:
+            return Route("weather", {"city": city}, 0.95)
+        if any(intent == "reference" for intent, _, _ in hits):
+            return Route("weather", {"city_from_context": True}, 0.9)
+        unknown = [w for w in UNKNOWN_PLACE.findall(lower) if w not in NOT_PLACES]
+        if unknown:
+            # Looks like a place we have never heard of: let the LLM extract it
+            return Route("weather", {}, 0.4)
+        # No place mentioned at all ("will it rain tomorrow?")
+        return Route("weather", {"city_from_context": True}, 0.8)
+
+    def _route_calendar(self, text, lower, hits):
+        words = {word for intent, _, word in hits if intent == "calendar"}
+        about_appointments = bool(words & {"appointment", "meeting", "calendar"})
+        if not about_appointments and words <= WEAK_CALENDAR_WORDS:
+            # "where is the station?" is small talk, not a calendar request
+            return None
+
+        actions = {label for intent, label, _ in hits if intent == "calendar" and label}
+        action = next((a for a in ACTION_PRIORITY if a in actions), None)
+        slots = {"action": action or "list"}
+        slots["is_next_query"] = bool(words & {"next", "where"}) and "appointment" in lower
+        id_match = EVENT_ID.search(lower)
+        if id_match:
+            slots["event_id"] = int(id_match.group(1))
+        title_match = TITLE.search(text)
+        if title_match:
+            slots["title"] = title_match.group(1).strip()
+
+        if action in ("create", "update"):
+            # Needs time (see temporal.py) and possibly title/location extraction
+            return Route("calendar", slots, 0.5)
+        if action is None:
+            return Route("calendar", slots, 0.6 if about_appointments else 0.3)
+        return Route("calendar", slots, 0.9)
+
+
+router = Router()
+if CITY_GAZETTEER:
+    router.load_gazetteer(CITY_GAZETTEER)
+    logger.info(f"Loaded gazetteer from {CITY_GAZETTEER}")
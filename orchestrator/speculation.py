@@ -0,0 +1,84 @@
+import os
+import asyncio
+import logging
+from forecast_cache import place_key
+
+logger = logging.getLogger("orchestrator")
+
+# Start the likely tool I/O while the LLM is still extracting parameters
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "1") == "1"
+
+
+class SpeculationStats:
+    """Counts speculative prefetches that the final parameters used vs. wasted."""
+
+    def __init__(self):
+        self.started = {}
+        self.used = {}
+        self.wasted = {}
+        # Used prefetches that had already finished when the LLM answered (a full round trip saved)
+        self.ready = {}
+
+    def count(self, outcome, kind):
+        counter = getattr(self, outcome)
+        counter[kind] = counter.get(kind, 0) + 1
+
+    def snapshot(self):
+        used, wasted = sum(self.used.values()), sum(self.wasted.values())
+        return {
+            "started": dict(self.started),
+            "used": dict(self.used),
+            "wasted": dict(self.wasted),
+            "ready": dict(self.ready),
+            "use_rate": round(used / (used + wasted), 4) if used + wasted else 0.0,
+        }
+
+
+stats = SpeculationStats()
+
+
+class Speculation:
+    """A tool call started on a guess.
+
+    The result is not handed over directly: the prefetch fills the forecast
+    cache / calendar mirror, and the real call finds it there (or joins the
+    in-flight load). `settle()` only records whether the guess was right; a
+    wasted prefetch is left to finish, since it still warms the cache.
+    """
+    __slots__ = ("kind", "guess", "task")
+
+    def __init__(self, kind, guess, coro):
+        self.kind = kind
+        self.guess = guess
+        self.task = asyncio.create_task(coro)
+        self.task.add_done_callback(_consume)
+        stats.count("started", kind)
+
+    def settle(self, used):
+        if used:
+            stats.count("used", self.kind)
+            if self.task.done():
+                stats.count("ready", self.kind)
+        else:
+            stats.count("wasted", self.kind)
+            logger.info(f"Speculative {self.kind} prefetch for {self.guess!r} wasted")
+
+
+def _consume(task):
+    # Failures surface again in the real call; don't log "exception never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+def prefetch_forecast(forecasts, city):
+    """Warm the forecast for the city the user probably means (the session's last city)."""
+    if not SPECULATIVE_PREFETCH or not city or forecasts.is_cached(city):
+        return None
+    return Speculation("weather", place_key(city), forecasts.get(city))
+
+
+def prefetch_calendar(calendar):
+    """Resync the calendar mirror for list / next / delete-latest flows."""
+    if not SPECULATIVE_PREFETCH or calendar.is_fresh():
+        return None
+    return Speculation("calendar", "mirror", calendar.ensure_fresh())
@@ -0,0 +1,68 @@
+import re
+import json
+import base64
+from replies import Reply
+
+# --- Sentence Splitting ---
+# A sentence ends at . ! ? (optionally followed by quotes/brackets) and whitespace,
+# or at a newline. "3.5" or "e.g.x" are not split because no whitespace follows.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+
+
+class SentenceSplitter:
+    """Accumulates streamed LLM tokens and emits complete sentences.
+
+    Very short fragments ("Sure.") are held back and merged with the next
+    sentence so the TTS service is not called for a single word.
+    """
+
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token):
+        """Add a token, return the list of sentences completed by it."""
+        self.buffer += token
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever is left once the token stream has ended."""
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return rest or None
+
+
+def split_sentences(text, min_chars=12):
+    """Split an already complete answer (e.g. tool output) into sentences."""
+    if isinstance(text, Reply):
+        # Keep the template segments of each sentence for the TTS cache
+        return text.sentences(min_chars)
+    splitter = SentenceSplitter(min_chars)
+    sentences = splitter.feed(text)
+    rest = splitter.flush()
+    return sentences + [rest] if rest else sentences
+
+
+# --- NDJSON Events ---
+# /process/stream answers with one JSON object per line:
+#   {"type": "transcript", "text": ...}
+#   {"type": "text", "index": n, "text": ...}
+#   {"type": "audio", "index": n, "media_type": "audio/wav", "data": <base64>, "duration": seconds}
+#   {"type": "done", "text": <full answer>}
+#   {"type": "error", "message": ...}
+def event(kind, **fields):
+    return (json.dumps({"type": kind, **fields}) + "\n").encode("utf-8")
+
+
+def audio_event(index, audio_bytes, media_type="audio/wav", duration=None):
+    fields = {"duration": round(duration, 3)} if duration is not None else {}
+    return event("audio", index=index, media_type=media_type,
+                 data=base64.b64encode(audio_bytes).decode("ascii"), **fields)
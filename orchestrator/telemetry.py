@@ -0,0 +1,130 @@
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+
+# Propagated to Whisper/TTS so one utterance can be followed through every service's logs
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+timings_var = contextvars.ContextVar("timings", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram("orchestrator_request_seconds", "End-to-end request latency",
+                            ["path", "status"], buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("orchestrator_stage_seconds", "Latency of one pipeline stage",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_ERRORS = Counter("orchestrator_stage_errors_total", "Pipeline stages that raised", ["stage"])
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+def outgoing_headers():
+    """Headers every call to another service should carry."""
+    request_id = request_id_var.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+@contextmanager
+def stage(name):
+    """Time a block: observed in the stage histogram and kept for Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage=name).inc()
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=name).observe(seconds)
+        timings = timings_var.get()
+        if timings is not None:
+            timings.append((name, seconds))
+
+
+def stage_timings():
+    return list(timings_var.get() or [])
+
+
+def labeled_timings():
+    """Recorded stages as (label, seconds); repeated stages (e.g. two LLM calls)
+    get a numeric suffix: llm_chat, llm_chat-2."""
+    seen = {}
+    labeled = []
+    for name, seconds in stage_timings():
+        seen[name] = seen.get(name, 0) + 1
+        labeled.append((name if seen[name] == 1 else f"{name}-{seen[name]}", seconds))
+    return labeled
+
+
+def server_timing():
+    """Format the recorded stages as a Server-Timing header value."""
+    return ", ".join(f"{label};dur={seconds * 1000:.1f}" for label, seconds in labeled_timings())
+
+
+class TelemetryMiddleware:
+    """Pure ASGI middleware: request id, per-request stage timings, request histogram."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode() or uuid.uuid4().hex
+        request_id_var.set(request_id)
+        timings_var.set([])
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.labels(path=scope["path"], status=str(status["code"])).observe(
+                time.perf_counter() - start)
+
+
+class StatsCollector:
+    """Exposes the JSON stats of caches/routers as gauges at scrape time.
+
+    Every numeric value of `snapshot()` becomes `<prefix>_<key>`; nested dicts
+    become a `key` label, e.g. router_fast_path{key="weather"}.
+    """
+
+    def __init__(self, prefix, snapshot):
+        self.prefix = prefix
+        self.snapshot = snapshot
+
+    def collect(self):
+        for key, value in self.snapshot().items():
+            name = f"{self.prefix}_{key}"
+            if isinstance(value, dict):
+                family = GaugeMetricFamily(name, f"{self.prefix} {key}", labels=["key"])
+                for label, number in value.items():
+                    if isinstance(number, (int, float)):
+                        family.add_metric([str(label)], number)
+                yield family
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield GaugeMetricFamily(name, f"{self.prefix} {key}", value=value)
+
+
+def register_stats(prefix, snapshot):
+    REGISTRY.register(StatsCollector(prefix, snapshot))
+
+
+def metrics_payload():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,276 @@
+import re
+from datetime import datetime, timedelta
+
+# Appointments without an explicit duration or end time last this long
+DEFAULT_DURATION_MINUTES = 60
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20,
+    "thirty": 30, "forty five": 45, "forty-five": 45, "ninety": 90,
+}
+# A period ("next week") is a sure range to list, but its first day is only a guess
+# for the day of a new appointment
+PERIOD_START_CONFIDENCE = 0.6
+# Used when only a part of the day is given ("tomorrow morning")
+PARTS_OF_DAY = {"morning": 9, "noon": 12, "afternoon": 15, "evening": 19, "tonight": 20, "night": 20}
+
+MONTH_NAME = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+WEEKDAY_NAME = r"(monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+# 9, 9:30, 9.30 followed by am/pm, or a bare hour after "at"/"@"/"from"/"until"
+CLOCK = r"(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?"
+
+RE_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})(?:[t ](\d{2}):(\d{2}))?\b")
+RE_MONTH_DAY = re.compile(MONTH_NAME + r"\s+(?:the\s+)?(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4}))?")
+RE_DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAME + r"\b(?:,?\s+(\d{4}))?")
+RE_ORDINAL = re.compile(r"\bthe\s+(\d{1,2})(st|nd|rd|th)\b")
+RE_RELATIVE_DAY = re.compile(r"\b(day after tomorrow|tomorrow|today|tonight)\b")
+RE_IN_DAYS = re.compile(r"\bin\s+(\d+)\s+(day|week)s?\b")
+RE_NEXT_WEEK = re.compile(r"\bnext\s+week\b")
+RE_WEEKDAY = re.compile(r"\b(?:(next|this|coming)\s+)?" + WEEKDAY_NAME + r"\b")
+RE_RANGE = re.compile(r"\b(?:(from|between)\s+)?" + CLOCK + r"\s*(?:-|to|until|till|and)\s*" + CLOCK + r"\b")
+RE_TIME = re.compile(r"(?:\b(at|@|from|by)\s+)?\b" + CLOCK + r"(?:\s*o'?clock)?\b")
+RE_UNTIL = re.compile(r"\b(?:until|till|to)\s+" + CLOCK + r"\b")
+RE_NOON = re.compile(r"\b(noon|midday|midnight)\b")
+RE_PART_OF_DAY = re.compile(r"\b(morning|afternoon|evening|tonight|night)\b")
+# "appointment 5", "meeting #5", "id 5": the number right after names an event, not a time
+RE_ID_PREFIX = re.compile(r"\b(?:id|appointment|meeting|event|number)\s*(?:number\s*)?#?\s*$")
+RE_DURATION = re.compile(
+    r"\bfor\s+(?:(\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?)"
+    r"(?:\s+and\s+(\d+)\s*(?:minutes?|mins?))?|(an?|one)\s+hour(\s+and\s+a\s+half)?|half\s+an?\s+hour)\b")
+
+
+class TemporalSpan:
+    """`start`/`end` is the appointment; `days`/`date_confidence` describe the date
+    expression as a period ("tomorrow" = 1 day, "next week" = 7 days from Monday)."""
+    __slots__ = ("start", "end", "confidence", "has_date", "has_time", "days", "date_confidence")
+
+    def __init__(self, start, end, confidence, has_date, has_time, days=1, date_confidence=0.0):
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+        self.has_date = has_date
+        self.has_time = has_time
+        self.days = days
+        self.date_confidence = date_confidence
+
+    @property
+    def start_time(self):
+        return self.start.strftime("%Y-%m-%dT%H:%M")
+
+    @property
+    def end_time(self):
+        return self.end.strftime("%Y-%m-%dT%H:%M")
+
+    @property
+    def range_start(self):
+        """First day of the period at 00:00 (for listing)."""
+        return self.start.strftime("%Y-%m-%dT00:00")
+
+    @property
+    def range_end(self):
+        return (self.start + timedelta(days=self.days)).strftime("%Y-%m-%dT00:00")
+
+    def __repr__(self):
+        return f"TemporalSpan({self.start_time} -> {self.end_time}, {self.confidence:.2f})"
+
+
+def normalize(text):
+    text = text.lower()
+    text = re.sub(r"\b([ap])\.?\s?m\b\.?", r"\1m", text)  # "10 p.m." -> "10 pm"
+    for word, number in sorted(NUMBER_WORDS.items(), key=lambda kv: -len(kv[0])):
+        text = re.sub(rf"\b{word}\b", str(number), text)
+    return re.sub(r"\s+", " ", text)
+
+
+def to_24h(hour, minute, meridiem):
+    """Returns (hour, minute, ambiguous) or None when the clock value is invalid."""
+    hour, minute = int(hour), int(minute or 0)
+    if minute > 59 or hour > 24:
+        return None
+    if meridiem:
+        if hour > 12 or hour == 0:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+        return hour, minute, False
+    if hour > 12:
+        return hour % 24, minute, False
+    # "at 3" in a calendar means 15:00; 8-12 are taken as morning hours
+    if 1 <= hour <= 7:
+        return hour + 12, minute, True
+    return hour, minute, hour != 12
+
+
+def parse_date(text, now):
+    """Returns (first date, confidence, days) for the first date expression found, else (None, 0, 0)."""
+    today = now.date()
+
+    m = RE_ISO_DATE.search(text)
+    if m:
+        try:
+            return datetime(int(m[1]), int(m[2]), int(m[3])).date(), 1.0, 1
+        except ValueError:
+            pass
+
+    for regex, month_group, day_group in ((RE_MONTH_DAY, 1, 2), (RE_DAY_MONTH, 2, 1)):
+        m = regex.search(text)
+        if m:
+            month, day = MONTHS[m[month_group][:3]], int(m[day_group])
+            year = int(m[3]) if m[3] else today.year
+            try:
+                date = datetime(year, month, day).date()
+            except ValueError:
+                continue
+            if not m[3] and date < today:
+                # "January 12th" said in October means next January
+                date = date.replace(year=year + 1)
+            return date, 0.95, 1
+
+    m = RE_RELATIVE_DAY.search(text)
+    if m:
+        offset = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[m[1]]
+        return today + timedelta(days=offset), 0.95, 1
+
+    m = RE_IN_DAYS.search(text)
+    if m:
+        days = int(m[1]) * (7 if m[2] == "week" else 1)
+        return today + timedelta(days=days), 0.9, 1
+
+    m = RE_WEEKDAY.search(text)
+    if m:
+        target = WEEKDAYS.index(m[2])
+        ahead = (target - today.weekday()) % 7
+        if ahead == 0 and m[1] != "this":
+            ahead = 7
+        return today + timedelta(days=ahead), 0.9 if m[1] != "next" else 0.85, 1
+
+    if RE_NEXT_WEEK.search(text):
+        # Monday to Sunday of next week
+        return today + timedelta(days=7 - today.weekday()), 0.9, 7
+
+    m = RE_ORDINAL.search(text)
+    if m:
+        day = int(m[1])
+        year, month = today.year, today.month
+        for _ in range(12):
+            try:
+                date = datetime(year, month, day).date()
+                if date >= today:
+                    return date, 0.8, 1
+            except ValueError:
+                pass
+            month = month % 12 + 1
+            year += month == 1
+
+    return None, 0.0, 0
+
+
+def parse_clock(match, offset=0):
+    return to_24h(match[1 + offset], match[2 + offset], match[3 + offset])
+
+
+def is_event_id(text, match, group, event_id=None):
+    """Whether the number in `group` names an appointment ("move appointment 1 to 3 pm")."""
+    if RE_ID_PREFIX.search(text, 0, match.start(group)):
+        return True
+    bare = not (match[group + 1] or match[group + 2])
+    return bare and event_id is not None and int(match[group]) == int(event_id)
+
+
+def parse_time(text, event_id=None):
+    """Returns (start (h, m), end (h, m) or None, confidence) or (None, None, 0).
+
+    `event_id` (the appointment id the router found) is never read as an hour.
+    """
+    for m in RE_RANGE.finditer(text):
+        # "2 to 4 pm" is as likely "move 2 to 4 pm": a bare start needs "from"/"between"
+        if not (m[1] or m[3] or m[4]) or is_event_id(text, m, 2, event_id):
+            continue
+        start_meridiem = m[4] or m[7]  # "from 9 to 11 am": both share the trailing meridiem
+        start = to_24h(m[2], m[3], start_meridiem if int(m[2]) <= int(m[5]) or m[4] else m[4])
+        end = to_24h(m[5], m[6], m[7] or start_meridiem)
+        if start and end:
+            return start[:2], end[:2], 0.95
+
+    for m in RE_TIME.finditer(text):
+        prefix, hour, minute, meridiem = m[1], m[2], m[3], m[4]
+        if not (prefix or minute or meridiem or "o'clock" in m[0] or "oclock" in m[0]):
+            continue  # a bare number is more likely a day, an id or a duration
+        if is_event_id(text, m, 2, None if prefix else event_id):
+            continue
+        clock = to_24h(hour, minute, meridiem)
+        if clock:
+            end = RE_UNTIL.search(text, m.end())
+            end_clock = to_24h(end[1], end[2], end[3]) if end else None
+            confidence = 0.8 if clock[2] else 0.95
+            return clock[:2], end_clock[:2] if end_clock else None, confidence
+
+    m = RE_NOON.search(text)
+    if m:
+        return ((0, 0) if m[1] == "midnight" else (12, 0)), None, 0.95
+
+    m = RE_PART_OF_DAY.search(text)
+    if m:
+        return (PARTS_OF_DAY[m[1]], 0), None, 0.6
+
+    return None, None, 0.0
+
+
+def parse_duration(text):
+    """Returns a timedelta for "for 2 hours", "for an hour and a half", ... or None."""
+    m = RE_DURATION.search(text)
+    if not m:
+        return None
+    if m[1]:
+        amount = float(m[1])
+        minutes = amount * 60 if m[2].startswith("h") else amount
+        return timedelta(minutes=minutes + int(m[3] or 0))
+    if m[4]:
+        return timedelta(minutes=90 if m[5] else 60)
+    return timedelta(minutes=30)
+
+
+def parse_temporal(text, now=None, event_id=None):
+    """Resolve the date/time expression in `text` against `now`.
+
+    Returns a TemporalSpan (start, end, confidence) or None if the text has no
+    temporal expression. A time without a date means today, or tomorrow if that
+    time has already passed; a date without a time defaults to 09:00.
+    `event_id` is an appointment id mentioned in the text, not a time.
+    """
+    now = now or datetime.now()
+    text = normalize(text)
+
+    date, period_conf, days = parse_date(text, now)
+    start_clock, end_clock, time_conf = parse_time(text, event_id)
+    if date is None and start_clock is None:
+        return None
+    date_conf = period_conf if days == 1 else min(period_conf, PERIOD_START_CONFIDENCE)
+
+    if start_clock is None:
+        start = datetime.combine(date, datetime.min.time()).replace(hour=9)
+        confidence = date_conf * 0.75
+    else:
+        base = date or now.date()
+        start = datetime.combine(base, datetime.min.time()).replace(hour=start_clock[0] % 24, minute=start_clock[1])
+        if date is None and start < now:
+            start += timedelta(days=1)
+            time_conf *= 0.9
+        confidence = min(date_conf, time_conf) if date else time_conf * 0.9
+
+    duration = parse_duration(text)
+    if end_clock is not None:
+        end = start.replace(hour=end_clock[0] % 24, minute=end_clock[1])
+        if end <= start:
+            end += timedelta(days=1)
+    else:
+        end = start + (duration or timedelta(minutes=DEFAULT_DURATION_MINUTES))
+
+    return TemporalSpan(start, end, round(confidence, 3), date is not None, start_clock is not None,
+                        days=max(days, 1), date_confidence=period_conf)
+
@@ -0,0 +1,59 @@
+"""Templated tool replies and the segments they send to the TTS service.
+
+    pytest orchestrator/test_replies.py
+"""
+import asyncio
+import pytest
+import main
+import tools
+from replies import reply, Slot
+from streaming import split_sentences
+
+FORECAST = {"place": "Marburg", "days": {"monday": {"weather": "clear sky", "max": 20, "min": 5}}}
+
+
+def test_reply_is_the_plain_text():
+    r = reply("Deleted appointment ID ", 7, ".")
+    assert r == "Deleted appointment ID 7."
+    assert r.segments == [{"text": "Deleted appointment ID", "cache": True}, {"text": "7.", "cache": False}]
+
+
+def test_weather_reply_only_renders_place_and_temperatures():
+    r = tools.format_weather_response(FORECAST, "weather in Marburg on Monday")
+    assert r == "Weather for Marburg: On Monday, expect clear sky with a high of 20 degrees and a low of 5 degrees."
+    assert [s["text"] for s in r.segments if not s["cache"]] == ["Marburg:", "20", "5"]
+    assert [s["text"] for s in r.segments if s["cache"]] == [
+        "Weather for", "On Monday, expect clear sky with a high of", "degrees and a low of", "degrees."]
+
+
+def test_split_keeps_segments_per_sentence():
+    r = reply("Your schedule: ", Slot("[ID 1] Team on 2025-01-10 at 09:00"), ". ", Slot("[ID 2] Lunch on 2025-01-11 at 12:00"))
+    first, second = split_sentences(r)
+    assert first == "Your schedule: [ID 1] Team on 2025-01-10 at 09:00."
+    assert [s["cache"] for s in first.segments] == [True, False]
+    assert second.segments == [{"text": "[ID 2] Lunch on 2025-01-11 at 12:00", "cache": False}]
+
+
+@pytest.mark.parametrize("text, segments", [
+    ("Tell me a joke.", None),
+    (reply("Updated appointment ID ", 3, "."), [{"text": "Updated appointment ID", "cache": True},
+                                                {"text": "3.", "cache": False}]),
+])
+def test_synthesize_sends_segments(monkeypatch, text, segments):
+    sent = {}
+
+    class FakeResponse:
+        content = b"RIFF"
+        headers = {"content-type": "audio/wav", "x-audio-duration": "1.5"}
+
+        def raise_for_status(self):
+            pass
+
+    async def fake_request(backend, method, url, **kwargs):
+        sent.update(kwargs["json"])
+        return FakeResponse()
+
+    monkeypatch.setattr(main.backends, "request", fake_request)
+    assert asyncio.run(main.synthesize(text)) == (b"RIFF", "audio/wav", 1.5)
+    assert sent["text"] == text
+    assert sent.get("segments") == segments
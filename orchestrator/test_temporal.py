@@ -0,0 +1,76 @@
+"""Reference utterances for temporal.py, resolved against Friday 2025-01-10 14:00.
+
+    pytest orchestrator/test_temporal.py
+    python orchestrator/test_temporal.py   # per-utterance cost
+"""
+from datetime import datetime
+import pytest
+from temporal import parse_temporal
+
+REFERENCE_NOW = datetime(2025, 1, 10, 14, 0)
+MIN_CONFIDENCE = 0.75  # main.TEMPORAL_MIN_CONFIDENCE
+
+CORPUS = [
+    # (utterance, event id from the router, expected start, expected end)
+    ("Add an appointment titled Team Meeting for January 12th at 9am.", None, "2025-01-12T09:00", "2025-01-12T10:00"),
+    ("Schedule a call at 10 p.m.", None, "2025-01-10T22:00", "2025-01-10T23:00"),
+    ("Meeting next Tuesday at 9", None, "2025-01-14T09:00", "2025-01-14T10:00"),
+    ("Dentist tomorrow at 3 for 30 minutes", None, "2025-01-11T15:00", "2025-01-11T15:30"),
+    ("Lunch with Anna on Friday at noon", None, "2025-01-17T12:00", "2025-01-17T13:00"),
+    ("Workshop on the 20th from 9 to 11 am", None, "2025-01-20T09:00", "2025-01-20T11:00"),
+    ("Review on 2025-02-03 14:30", None, "2025-02-03T14:30", "2025-02-03T15:30"),
+    ("Standup at 9:15 am for 15 minutes", None, "2025-01-11T09:15", "2025-01-11T09:30"),
+    ("Call the bank in 3 days at 11", None, "2025-01-13T11:00", "2025-01-13T12:00"),
+    ("Party on the 3rd of March at 8 pm for two hours", None, "2025-03-03T20:00", "2025-03-03T22:00"),
+    ("Move it to 4:30 pm", None, "2025-01-10T16:30", "2025-01-10T17:30"),
+    ("Gym tomorrow morning for an hour and a half", None, "2025-01-11T09:00", "2025-01-11T10:30"),
+    ("Doctor the day after tomorrow at 8 o'clock", None, "2025-01-12T08:00", "2025-01-12T09:00"),
+    ("Team dinner this saturday evening", None, "2025-01-11T19:00", "2025-01-11T20:00"),
+    ("Conference December 5, 2025", None, "2025-12-05T09:00", "2025-12-05T10:00"),
+    ("Sprint planning Monday 10am until 12pm", None, "2025-01-13T10:00", "2025-01-13T12:00"),
+    ("Review between 3 and 5", None, "2025-01-10T15:00", "2025-01-10T17:00"),
+    # An appointment id followed by "to <time>" is not a range
+    ("Move appointment 1 to 3 pm", 1, "2025-01-10T15:00", "2025-01-10T16:00"),
+    ("Change meeting 2 to 4 pm", 2, "2025-01-10T16:00", "2025-01-10T17:00"),
+    ("Change meeting 5 to 4 pm", 5, "2025-01-10T16:00", "2025-01-10T17:00"),
+    ("Move appointment number 7 to 10 am tomorrow", 7, "2025-01-11T10:00", "2025-01-11T11:00"),
+    ("Move 3 to 5 pm", 3, "2025-01-10T17:00", "2025-01-10T18:00"),
+    ("Tell me a joke", None, None, None),
+    ("Delete appointment 55", 55, None, None),
+]
+
+PERIODS = [
+    # (utterance, expected range start, expected range end, confident enough to filter a list)
+    ("List my appointments tomorrow", "2025-01-11T00:00", "2025-01-12T00:00", True),
+    ("List appointments for next week", "2025-01-13T00:00", "2025-01-20T00:00", True),
+    ("Show my meetings on Friday", "2025-01-17T00:00", "2025-01-18T00:00", True),
+]
+
+
+@pytest.mark.parametrize("utterance, event_id, start, end", CORPUS)
+def test_resolves(utterance, event_id, start, end):
+    span = parse_temporal(utterance, REFERENCE_NOW, event_id=event_id)
+    got = (span.start_time, span.end_time) if span else (None, None)
+    assert got == (start, end), span
+
+
+@pytest.mark.parametrize("utterance, start, end, confident", PERIODS)
+def test_list_period(utterance, start, end, confident):
+    span = parse_temporal(utterance, REFERENCE_NOW)
+    assert (span.range_start, span.range_end) == (start, end)
+    assert (span.date_confidence >= MIN_CONFIDENCE) == confident
+
+
+def test_period_does_not_pin_an_appointment():
+    # "next week" is a sure range, but Monday is only a guess for a new appointment
+    span = parse_temporal("Schedule a meeting next week at 3 pm", REFERENCE_NOW)
+    assert span.start_time == "2025-01-13T15:00"
+    assert span.confidence < MIN_CONFIDENCE
+
+
+if __name__ == "__main__":
+    import timeit
+    utterances = [u for u, _, _, _ in CORPUS]
+    rounds = 2000
+    seconds = timeit.timeit(lambda: [parse_temporal(u, REFERENCE_NOW) for u in utterances], number=rounds)
+    print(f"{seconds / (rounds * len(utterances)) * 1e6:.1f} µs per utterance")
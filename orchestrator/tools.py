@@ -1,12 +1,16 @@
-import requests
 import json
 import os
 import logging
 from datetime import datetime, timedelta
+import httpx
+from backends import request
+from forecast_cache import ForecastCache, parse_forecast
+from calendar_mirror import CalendarMirror
+from replies import reply, Slot
 
 # --- Configuration ---
-WEATHER_URL = "https://api.responsible-nlp.net/weather.php"
-CALENDAR_URL = "https://api.responsible-nlp.net/calendar.php"
+WEATHER_URL = os.getenv("WEATHER_URL", "https://api.responsible-nlp.net/weather.php")
+CALENDAR_URL = os.getenv("CALENDAR_URL", "https://api.responsible-nlp.net/calendar.php")
 TEAM_CALENDAR_ID = os.getenv("TEAM_CALENDAR_ID", "3864546")
 
 # --- Logger Setup ---
@@ -18,102 +22,111 @@ handler.setFormatter(logging.Formatter('%(asctime)s - [TOOLS] - %(levelname)s -
 if not logger.handlers:
     logger.addHandler(handler)
 
-def format_weather_response(data, user_text):
-    """Deterministic mapping of API JSON to Speech."""
-    if not isinstance(data, dict):
-        return "I'm sorry, I couldn't retrieve the weather data right now."
+# --- Forecast Cache ---
+# One cached, parsed forecast per place; get_weather and format_weather_response both read it.
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "900"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "256"))
+WEATHER_HOT_CITIES = os.getenv("WEATHER_HOT_CITIES", "Marburg,Frankfurt").split(",")
+# Background refresh of the hot cities, in seconds (0 disables it)
+WEATHER_REFRESH_SECONDS = float(os.getenv("WEATHER_REFRESH_SECONDS", "0"))
 
-    place = data.get("place", "the requested location").replace("&#039;", "'")
-    forecast = data.get("forecast", [])
-    
-    # Resolve 'today' to the actual current weekday (e.g., 'Saturday')
-    current_day = datetime.now().strftime('%A').lower()
-    
+class WeatherServiceError(Exception):
+    pass
+
+async def fetch_forecast(city: str):
+    """Calls the weather API (No API Key required per requirements) and parses the 7-day forecast."""
+    response = await request("weather", "POST", WEATHER_URL, data={"place": city})
+    if response.status_code != 200:
+        raise WeatherServiceError(f"Weather API returned {response.status_code}")
+    return parse_forecast(response.json(), city)
+
+forecasts = ForecastCache(fetch_forecast, ttl=WEATHER_CACHE_TTL, max_entries=WEATHER_CACHE_SIZE,
+                          hot_places=[c.strip() for c in WEATHER_HOT_CITIES],
+                          refresh_interval=WEATHER_REFRESH_SECONDS)
+
+DAYS_OF_WEEK = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+def resolve_target_day(user_text):
+    """Map 'tomorrow' or a weekday name to a weekday; default is today (e.g. 'saturday')."""
     user_lower = user_text.lower()
-    days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    
-    # Priority: 1. Specific day mentioned, 2. 'Today' resolved to weekday
-    target_day = next((d for d in days if d in user_lower), current_day)
-    
-    day_info = next((d for d in forecast if d['day'].lower() == target_day), None)
-    
-    if not day_info:
-        return f"I couldn't find the forecast for {target_day.capitalize()} in {place}."
+    if "tomorrow" in user_lower:
+        return (datetime.now() + timedelta(days=1)).strftime("%A").lower()
+    current_day = datetime.now().strftime("%A").lower()
+    return next((d for d in DAYS_OF_WEEK if d in user_lower), current_day)
+
+def format_weather_response(forecast, user_text):
+    """Deterministic mapping of a cached forecast to Speech.
+
+    Maps 'today' or 'tomorrow' to the correct weekday name; a day outside the
+    forecast falls back to the nearest day.
+    """
+    if not isinstance(forecast, dict):
+        return "I'm sorry, I couldn't retrieve the weather data right now."
 
-    condition = day_info.get("weather", "clear sky")
-    high = day_info.get("temperature", {}).get("max", "?")
-    low = day_info.get("temperature", {}).get("min", "?")
+    # Priority: 1. Specific day mentioned, 2. 'Today' resolved to weekday
+    target_day = resolve_target_day(user_text)
+    selected = forecast["days"].get(target_day) or next(iter(forecast["days"].values()))
 
-    return f"Weather for {place} on {target_day.capitalize()}: expect {condition} with a high of {high} degrees and a low of {low}."
+    condition = selected["weather"] or "unknown conditions"
+    # Day and condition come from small vocabularies and stay cacheable; place and temperatures are slots
+    return reply("Weather for ", Slot(forecast["place"]), f": On {target_day.capitalize()}, expect {condition} with a high of ",
+                 selected["max"], " degrees and a low of ", selected["min"], " degrees.")
 
-def get_weather(city: str, user_text: str = ""):
+async def get_weather(city: str):
     """
-    Fetches 7-day forecast and dynamically maps 'today' or 'tomorrow' 
-    to the correct weekday name for the API response.
+    Reads the (cached) 7-day forecast for `city`, see forecast_cache.parse_forecast.
+    Returns an error message instead when there is no forecast.
     """
     try:
         # Clean city name (remove potential LLM artifacts like quotes)
         city = city.strip("'").strip('"')
-        
-        # 1. Call API (No API Key required per requirements)
-        response = requests.post(WEATHER_URL, data={"place": city})
-        if response.status_code != 200:
+
+        # Cached forecast (one upstream call per place per TTL)
+        try:
+            forecast = await forecasts.get(city)
+        except (WeatherServiceError, httpx.HTTPError):
             return "I couldn't connect to the weather service."
+        if not forecast:
+            return reply("I couldn't find weather data for ", Slot(city), ".")
+        return forecast
 
-        data = response.json()
-        forecasts = data.get("forecast", [])
-        if not forecasts:
-            return f"I couldn't find weather data for {city}."
+    except Exception as e:
+        return "There was an error processing the weather data."
 
-        # 2. Dynamic Day Resolution
-        user_lower = user_text.lower()
-        days_of_week = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-        
-        # Get the actual name of today (e.g., 'saturday')
-        current_day_name = datetime.now().strftime("%A").lower()
-        
-        # Determine Target Day
-        if "tomorrow" in user_lower:
-            target_day = (datetime.now() + timedelta(days=1)).strftime("%A").lower()
-        else:
-            # Check if a specific day name was mentioned
-            target_day = next((d for d in days_of_week if d in user_lower), current_day_name)
+# --- Calendar Mirror ---
+# Local, indexed copy of the team calendar; list/next/latest are answered without a round trip.
+CALENDAR_RESYNC_SECONDS = float(os.getenv("CALENDAR_RESYNC_SECONDS", "60"))
 
-        # 3. Find matching forecast
-        # We search the 7-day forecast for the resolved target_day
-        selected = next((f for f in forecasts if f.get("day", "").lower() == target_day), forecasts[0])
-        
-        # 4. Construct Response
-        condition = selected.get("weather", "unknown conditions")
-        temp = selected.get("temperature", {})
-        t_min = temp.get("min", "?")
-        t_max = temp.get("max", "?")
-        place_name = data.get("place", city).replace("&#039;", "'") # Clean HTML entities
+async def fetch_calendar(etag=None):
+    """GET the full calendar. Returns (events, etag), or (None, etag) if unchanged (304)."""
+    headers = {"If-None-Match": etag} if etag else None
+    res = await request("calendar", "GET", CALENDAR_URL, params={"calenderid": TEAM_CALENDAR_ID}, headers=headers)
+    if res.status_code == 304:
+        return None, etag
+    res.raise_for_status()
+    return res.json() or [], res.headers.get("etag")
 
-        return (f"Weather for {place_name}: On {target_day.capitalize()}, "
-                f"expect {condition} with a high of {t_max} degrees and a low of {t_min} degrees.")
+calendar = CalendarMirror(fetch_calendar, ttl=CALENDAR_RESYNC_SECONDS)
 
-    except Exception as e:
-        return "There was an error processing the weather data."
+def describe_time(event):
+    return (event.get('start_time') or '').replace('T', ' at ')
 
-def manage_calendar(action: str, event_id: int = None,is_next_query: bool = False, **kwargs):
+async def manage_calendar(action: str, event_id: int = None,is_next_query: bool = False, **kwargs):
     base_params = {"calenderid": TEAM_CALENDAR_ID}
     headers = {"Content-Type": "application/json"}
 
     # REQUIREMENT: Resolve 'latest' appointment if ID is missing (Slide 134, 135)
     if action in ["delete", "update", "remove", "change"] and not event_id:
-        list_res = requests.get(CALENDAR_URL, params=base_params)
         try:
-            events = list_res.json()
-            if events:
-                # Sort by ID to find the highest (latest) one
-                latest_event = max(events, key=lambda x: x['id'])
-                event_id = latest_event['id']
-                logger.info(f"Resolved latest ID for {action}: {event_id}")
-            else:
-                return "Your calendar is empty, nothing to modify."
-        except:
+            await calendar.ensure_fresh()
+        except Exception:
             return "Could not retrieve list to identify the latest appointment."
+        # Highest ID is the latest one
+        latest_event = calendar.latest()
+        if not latest_event:
+            return "Your calendar is empty, nothing to modify."
+        event_id = latest_event['id']
+        logger.info(f"Resolved latest ID for {action}: {event_id}")
 
     # 1. CREATE (POST) - Slide 95
     if action in ["add", "create"]:
@@ -125,52 +138,62 @@ def manage_calendar(action: str, event_id: int = None,is_next_query: bool = Fals
             "location": kwargs.get("location") or "TBD"
             
         }
-        res = requests.post(CALENDAR_URL, params={"calenderid": TEAM_CALENDAR_ID}, 
+        res = await request("calendar", "POST", CALENDAR_URL, params={"calenderid": TEAM_CALENDAR_ID}, 
                         headers={"Content-Type": "application/json"}, 
                         json=payload)       
         if res.status_code in [200, 201]:
-            new_id = res.json().get('id', 'unknown')
-            return f"Successfully created appointment '{payload['title']}' with ID {new_id}."
+            created = res.json()
+            new_id = created.get('id', 'unknown')
+            if new_id != 'unknown':
+                calendar.upsert({**payload, **created})
+            else:
+                calendar.invalidate()
+            return reply("Successfully created appointment '", Slot(payload["title"]), "' with ID ", new_id, ".")
         return f"Error creating event: {res.text}"
 
-    # # 2. UPDATE (PUT) - Slide 113
-    # elif "update" in action or "change" in action:
-    #     update_params = {**base_params, "id": event_id}
-    #     payload = {k: v for k, v in kwargs.items() if v is not None}
-    #     res = requests.put(CALENDAR_URL, params=update_params, headers=headers, json=payload)
-    #     return f"Updated appointment ID {event_id}." if res.status_code == 200 else f"Update failed: {res.text}"
-
-    # # 3. DELETE (DELETE) - Slide 121
-    # elif "delete" in action:
-    #     res = requests.delete(CALENDAR_URL, params={**base_params, "id": event_id})
-    #     return f"Deleted appointment ID {event_id}." if res.status_code == 200 else f"Delete failed: {res.text}"
-
     if action == "delete":
-        res = requests.delete(CALENDAR_URL, params={**base_params, "id": event_id})
-        return f"Deleted appointment ID {event_id}." if res.status_code == 200 else "Delete failed."
+        res = await request("calendar", "DELETE", CALENDAR_URL, params={**base_params, "id": event_id})
+        if res.status_code == 200:
+            calendar.remove(event_id)
+            return reply("Deleted appointment ID ", event_id, ".")
+        return "Delete failed."
     
     elif action == "update":
-        payload = {k: v for k, v in kwargs.items() if v and k in ["title", "start_time", "location", "description"]}
-        res = requests.put(CALENDAR_URL, params={**base_params, "id": event_id}, json=payload)
-        return f"Updated appointment ID {event_id}." if res.status_code == 200 else "Update failed."
+        payload = {k: v for k, v in kwargs.items() if v and k in ["title", "start_time", "end_time", "location", "description"]}
+        res = await request("calendar", "PUT", CALENDAR_URL, params={**base_params, "id": event_id}, json=payload)
+        if res.status_code == 200:
+            if calendar.has(event_id):
+                calendar.upsert({"id": event_id, **payload})
+            else:
+                calendar.invalidate()
+            return reply("Updated appointment ID ", event_id, ".")
+        return "Update failed."
 
     if action == "list":
-        res = requests.get(CALENDAR_URL, params=base_params)
-        events = res.json()
-        if not events: 
+        await calendar.ensure_fresh()
+        if not calendar.ids:
             return "You have no appointments scheduled."
         
-        # Requirement: "Where is my next appointment?" -> Get smallest ID
+        # Requirement: "Where is my next appointment?" -> earliest upcoming start_time
         if is_next_query:
-            # Finding the smallest ID as requested
-            next_event = min(events, key=lambda x: x['id'])
-            # Fetch single detail (GET with ID) as per Requirement 109
-            detail_res = requests.get(CALENDAR_URL, params={**base_params, "id": next_event['id']})
-            e = detail_res.json()
-            return f"Your next appointment is {e.get('title')} on {e.get('start_time','').replace('T',' at ')}."
+            e = calendar.next_upcoming(datetime.now().strftime('%Y-%m-%dT%H:%M'))
+            if not e:
+                return "You have no upcoming appointments."
+            return reply("Your next appointment is ", Slot(e.get("title")), " on ", Slot(describe_time(e)), ".")
+
+        # Time-range query ("list my appointments tomorrow")
+        if kwargs.get("range_start") and kwargs.get("range_end"):
+            events = calendar.between(kwargs["range_start"], kwargs["range_end"])
+            if not events:
+                return "You have no appointments scheduled in that period."
+        else:
+            events = calendar.events()
 
         # Standard List logic (Requirement 103)
-        summary = [f"[ID {e.get('id')}] {e.get('title')} on {e.get('start_time','').replace('T',' at ')}" for e in events]
-        return "Your schedule: " + ". ".join(summary)
+        summary = [Slot(f"[ID {e.get('id')}] {e.get('title')} on {describe_time(e)}") for e in events]
+        parts = ["Your schedule: "]
+        for n, item in enumerate(summary):
+            parts += [". ", item] if n else [item]
+        return reply(*parts)
 
     return "Unknown calendar action."
\ No newline at end of file
@@ -0,0 +1,90 @@
+import time
+import asyncio
+from collections import OrderedDict
+
+
+class TTLCache:
+    """In-memory TTL + LRU cache with single-flight loading.
+
+    Concurrent lookups of the same missing key share one `load()` call. Values
+    can be anything; callers that mutate a cached dict must copy it first.
+    `None` is never stored, so a failed load is retried next time. A TTL or
+    size of 0 disables the cache (every lookup loads).
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.inflight = {}  # key -> Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key):
+        """The fresh cached value (counted as a hit), else None."""
+        if not self.enabled or key is None:
+            return None
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self.entries[key]
+        return None
+
+    def put(self, key, value):
+        if not self.enabled or key is None or value is None:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def is_cached(self, key):
+        """True if a lookup would be answered without starting a load."""
+        entry = self.entries.get(key)
+        return key in self.inflight or bool(entry and entry[0] > time.monotonic())
+
+    async def get_or_load(self, key, load):
+        """Return the cached value for `key`, or await `load()` and cache its result."""
+        if not self.enabled or key is None:
+            return await load()
+        value = self.get(key)
+        if value is not None:
+            return value
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self.inflight[key] = asyncio.create_task(self._load(key, load))
+        # shield: a caller that gives up must not cancel the load others are waiting on
+        return await asyncio.shield(task)
+
+    async def _load(self, key, load):
+        try:
+            value = await load()
+            self.put(key, value)
+            return value
+        finally:
+            self.inflight.pop(key, None)
+
+    def record_miss(self):
+        """For callers that fill the cache themselves (e.g. streamed answers)."""
+        self.misses += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
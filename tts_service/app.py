@@ -1,31 +1,191 @@
-from fastapi import FastAPI
-from fastapi.responses import Response
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import Response, JSONResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from melo.api import TTS
 import os
-import tempfile
+import asyncio
+import torch
 import nltk
-nltk.download('averaged_perceptron_tagger_eng')
-app = FastAPI()
+from cache import AudioCache, make_key
+from workers import SynthesisPool
+from formats import negotiate, encode
+import telemetry
+from telemetry import STAGE_SECONDS, CHARACTERS, AUDIO_SECONDS, STARTUP_SECONDS
+from startup import ModelLoader
+from contextlib import asynccontextmanager
 
-# Load Model
+# --- Worker Pool ---
+# TTS_REPLICAS model copies are loaded, each rendered by its own worker thread.
+# TTS_THREADS caps the torch intra-op threads so replicas do not oversubscribe the CPU.
+TTS_REPLICAS = int(os.getenv("TTS_REPLICAS", "1"))
+TTS_THREADS = int(os.getenv("TTS_THREADS", "0"))
+if TTS_THREADS > 0:
+    torch.set_num_threads(TTS_THREADS)
+
+# --- Startup Configuration ---
+# Checkpoints and NLTK data come from the mounted caches / the image; only if they are
+# missing (first run) and ALLOW_MODEL_DOWNLOAD=1 are they fetched from the network.
+ALLOW_MODEL_DOWNLOAD = os.getenv("ALLOW_MODEL_DOWNLOAD", "1") == "1"
+# Sentence rendered by every replica before reporting ready (empty disables the warmup)
+WARMUP_TEXT = os.getenv("TTS_WARMUP_TEXT", "Hello, how can I help you today?")
+NLTK_RESOURCES = [("averaged_perceptron_tagger_eng", "taggers/averaged_perceptron_tagger_eng")]
+
+# Model (loaded in the background at startup, see ModelLoader)
 device = os.getenv("DEVICE", "cpu")
-print(f"Loading MeloTTS on {device}...")
-model = TTS(language="EN", device=device)
-speaker_ids = model.hps.data.spk2id
-default_speaker_id = list(speaker_ids.values())[0]
-print("MeloTTS Loaded.")
+language = "EN"
+models = []
+pool = None
+speaker_ids = {}
+default_speaker_id = None
+sample_rate = None
 
-class TTSRequest(BaseModel):
+def ensure_nltk():
+    for resource, path in NLTK_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if not ALLOW_MODEL_DOWNLOAD:
+                raise
+            print(f"NLTK resource {resource} not found locally, downloading...")
+            nltk.download(resource)
+
+def local_checkpoint():
+    """(config_path, ckpt_path) from the Hugging Face cache, or (None, None) if not cached."""
+    from huggingface_hub import hf_hub_download
+    from melo.download_utils import LANG_TO_HF_REPO_ID
+    repo = LANG_TO_HF_REPO_ID[language]
+    try:
+        return (hf_hub_download(repo, "config.json", local_files_only=True),
+                hf_hub_download(repo, "checkpoint.pth", local_files_only=True))
+    except Exception:
+        return None, None
+
+def load_models():
+    global models, pool, speaker_ids, default_speaker_id, sample_rate
+    ensure_nltk()
+    config_path, ckpt_path = local_checkpoint()
+    if ckpt_path is None:
+        if not ALLOW_MODEL_DOWNLOAD:
+            raise RuntimeError("MeloTTS checkpoint not found in the Hugging Face cache")
+        print("MeloTTS checkpoint not in the local cache, downloading...")
+    print(f"Loading MeloTTS on {device} ({TTS_REPLICAS} replica(s))...")
+    models = [TTS(language=language, device=device, config_path=config_path, ckpt_path=ckpt_path)
+              for _ in range(TTS_REPLICAS)]
+    speaker_ids = models[0].hps.data.spk2id
+    default_speaker_id = list(speaker_ids.values())[0]
+    sample_rate = models[0].hps.data.sampling_rate
+    pool = SynthesisPool(models)
+    print("MeloTTS Loaded.")
+
+def warmup_models():
+    """Render one sentence per replica: loads the BERT frontend and initializes the kernels."""
+    for model in models:
+        model.tts_to_file(WARMUP_TEXT, default_speaker_id, None)
+
+loader = ModelLoader(load_models, warmup_models if WARMUP_TEXT.strip() else None,
+                     on_phase=lambda phase, seconds: STARTUP_SECONDS.labels(phase=phase).set(seconds))
+
+@asynccontextmanager
+async def lifespan(app):
+    loader.start()
+    yield
+    if pool is not None:
+        pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(telemetry.TelemetryMiddleware)
+
+# --- Cache ---
+# In-memory LRU (byte budget) in front of a disk store that survives restarts.
+CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/root/.cache/tts") or None
+# The disk store is pruned back to this size, least recently used files first
+CACHE_DISK_MAX_BYTES = int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+# Silence inserted between stitched segments
+SEGMENT_GAP_MS = int(os.getenv("TTS_SEGMENT_GAP_MS", "60"))
+cache = AudioCache(CACHE_MAX_BYTES, CACHE_DIR, CACHE_DISK_MAX_BYTES)
+telemetry.register_stats("tts_cache", cache.stats)
+
+class Segment(BaseModel):
     text: str
+    # Fixed template parts are cached; slots (city, temperature...) are rendered fresh
+    cache: bool = True
+
+class TTSRequest(BaseModel):
+    text: str = ""
+    segments: Optional[List[Segment]] = None
+    speaker: Optional[str] = None
+    language: str = language
+    speed: float = 1.0
+    # "wav", "ogg" (Opus) or "pcm" (raw 16-bit); overrides the Accept header
+    format: Optional[str] = None
+
+async def render(text, speaker_id, speed):
+    CHARACTERS.inc(len(text))
+    with STAGE_SECONDS.labels(stage="render").time():
+        return await pool.render(text, speaker_id, speed)
+
+async def render_cached(text, speaker_id, speed, use_cache=True):
+    """Return raw 16-bit mono PCM for `text`, from the cache when possible."""
+    if not use_cache:
+        return await render(text, speaker_id, speed)
+    key = make_key(text, speaker_id, language, speed)
+    pcm = await cache.get(key)
+    if pcm is None:
+        pcm = await render(text, speaker_id, speed)
+        await cache.put(key, pcm)
+    return pcm
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up (the model may still be loading)."""
+    return JSONResponse(loader.status(), status_code=500 if loader.failed else 200)
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: the model is loaded and warmed up."""
+    return JSONResponse(loader.status(), status_code=200 if loader.ready else 503)
 
 @app.post("/synthesize")
-def synthesize(req: TTSRequest):
-    tmp_path = "output.wav"
-    # Generate audio
-    model.tts_to_file(req.text, default_speaker_id, tmp_path)
+async def synthesize(req: TTSRequest, accept: Optional[str] = Header(None)):
+    if not loader.ready:
+        raise HTTPException(status_code=503, detail=f"Model {loader.state}.", headers={"Retry-After": "5"})
+    if req.language.upper() != language:
+        raise HTTPException(status_code=400, detail=f"Only language '{language}' is loaded.")
+    if req.speaker and req.speaker not in speaker_ids:
+        raise HTTPException(status_code=400, detail=f"Unknown speaker '{req.speaker}'.")
+    try:
+        fmt = negotiate(req.format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    speaker_id = speaker_ids[req.speaker] if req.speaker else default_speaker_id
+    print(f"[{telemetry.current_request_id()}] Synthesizing {len(req.segments or [req.text])} part(s) as {fmt}")
+
+    if req.segments:
+        # Template stitching: cached fixed parts + freshly synthesized slots
+        gap = b"\x00\x00" * (sample_rate * SEGMENT_GAP_MS // 1000)
+        parts = [await render_cached(s.text, speaker_id, req.speed, s.cache)
+                 for s in req.segments if s.text.strip()]
+        pcm = gap.join(parts)
+    else:
+        pcm = await render_cached(req.text, speaker_id, req.speed)
+
+    # Opus encoding (resample + compress) is CPU work; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    with STAGE_SECONDS.labels(stage="encode").time():
+        content, media_type = await loop.run_in_executor(None, encode, pcm, sample_rate, fmt)
+    seconds = len(pcm) / 2 / sample_rate
+    AUDIO_SECONDS.labels(format=fmt).inc(seconds)
+    # Lets clients pace playback without decoding Opus themselves
+    return Response(content=content, media_type=media_type, headers={"X-Audio-Duration": f"{seconds:.3f}"})
 
-    with open(tmp_path, "rb") as f:
-        audio_data = f.read()
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
 
-    return Response(content=audio_data, media_type="audio/wav")
\ No newline at end of file
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: request latency, render/encode time, cache hit rates."""
+    payload, content_type = telemetry.metrics_payload()
+    return Response(content=payload, media_type=content_type)
@@ -0,0 +1,169 @@
+import os
+import re
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Canonical form used for cache keys: NFKC, collapsed whitespace, trimmed."""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_key(text, speaker_id, language, speed):
+    raw = f"{normalize_text(text)}|{speaker_id}|{language.upper()}|{speed:.2f}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Two-tier cache of synthesized audio (raw 16-bit PCM).
+
+    Tier 1 is an in-memory LRU bounded by `max_bytes`. Tier 2 is a directory of
+    `.pcm` files that survives restarts, bounded by `disk_max_bytes`: the least
+    recently used files (by mtime, which hits refresh) are deleted first.
+    Disk hits are promoted into memory. File I/O runs in a worker thread so
+    the event loop never waits on the disk.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir if disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.disk_entries = OrderedDict()  # key -> file size, least recently used first
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _path(self, key):
+        # Two-level fan-out keeps directories small with many cached phrases
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pcm")
+
+    def _scan_disk(self):
+        """Index the files left by previous runs, oldest first, and apply the budget."""
+        found = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Left behind by a crash mid-write
+                    self._unlink(path)
+                elif name.endswith(".pcm"):
+                    st = os.stat(path)
+                    found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self.disk_entries[key] = size
+            self.disk_size += size
+        self._prune_disk()
+
+    async def get(self, key):
+        pcm = self._recall(key)
+        if pcm is None and self.disk_dir:
+            pcm = await asyncio.to_thread(self._read, key)
+        if pcm is None:
+            with self.lock:
+                self.misses += 1
+        return pcm
+
+    async def put(self, key, pcm):
+        self._remember(key, pcm)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write, key, pcm)
+
+    def _recall(self, key):
+        with self.lock:
+            pcm = self.entries.get(key)
+            if pcm is not None:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+            return pcm
+
+    def _read(self, key):
+        with self.lock:
+            if key not in self.disk_entries:
+                return None
+            self.disk_entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pcm = f.read()
+            # The mtime is the LRU order a restart recovers
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.disk_size -= self.disk_entries.pop(key, 0)
+            return None
+        self._remember(key, pcm)
+        with self.lock:
+            self.disk_hits += 1
+        return pcm
+
+    def _write(self, key, pcm):
+        if len(pcm) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated entry behind
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pcm)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.disk_size += len(pcm) - self.disk_entries.pop(key, 0)
+            self.disk_entries[key] = len(pcm)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        evicted = []
+        with self.lock:
+            while self.disk_size > self.disk_max_bytes:
+                key, size = self.disk_entries.popitem(last=False)
+                self.disk_size -= size
+                evicted.append(key)
+        for key in evicted:
+            self._unlink(self._path(key))
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, key, pcm):
+        if len(pcm) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = pcm
+            self.size += len(pcm)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self.disk_entries),
+                "disk_bytes": self.disk_size,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
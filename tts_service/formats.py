@@ -0,0 +1,71 @@
+import io
+import wave
+import numpy as np
+import soundfile as sf
+import librosa
+
+# Opus only supports a few sample rates; 48 kHz is its native rate
+OPUS_SAMPLE_RATE = 48000
+
+# short name -> media type
+FORMATS = {
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+    "pcm": "audio/L16",
+}
+MEDIA_TYPES = {
+    "audio/wav": "wav", "audio/wave": "wav", "audio/x-wav": "wav",
+    "audio/ogg": "ogg", "audio/opus": "ogg",
+    "audio/l16": "pcm", "audio/pcm": "pcm",
+}
+
+
+def negotiate(requested=None, accept=None):
+    """Pick an output format from an explicit `format` field or the Accept header.
+
+    Falls back to WAV when nothing supported is asked for.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported format '{requested}'. Use one of: {', '.join(FORMATS)}.")
+        return requested
+
+    candidates = []
+    for position, item in enumerate((accept or "").split(",")):
+        parts = [p.strip() for p in item.split(";")]
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        fmt = MEDIA_TYPES.get(parts[0].lower())
+        if fmt and quality > 0:
+            candidates.append((-quality, position, fmt))
+    return min(candidates)[2] if candidates else "wav"
+
+
+def encode(pcm, sample_rate, fmt):
+    """Encode 16-bit mono PCM. Returns (bytes, media_type)."""
+    if fmt == "pcm":
+        # RFC 2586: audio/L16 is big-endian
+        samples = np.frombuffer(pcm, dtype="<i2").astype(">i2")
+        return samples.tobytes(), f"audio/L16; rate={sample_rate}; channels=1"
+
+    if fmt == "ogg":
+        audio = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768
+        if sample_rate != OPUS_SAMPLE_RATE:
+            audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=OPUS_SAMPLE_RATE)
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, OPUS_SAMPLE_RATE, format="OGG", subtype="OPUS")
+        return buffer.getvalue(), "audio/ogg"
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+    return buffer.getvalue(), "audio/wav"
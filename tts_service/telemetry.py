@@ -0,0 +1,75 @@
+import time
+import uuid
+import contextvars
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+
+# Set by the orchestrator; generated here for direct callers
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram("tts_request_seconds", "End-to-end request latency",
+                            ["path", "status"], buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("tts_stage_seconds", "Latency of one synthesis stage (render, encode)",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+CHARACTERS = Counter("tts_characters_total", "Characters synthesized by the model (cache misses only)")
+STARTUP_SECONDS = Gauge("tts_startup_seconds", "Duration of the startup phases (load, warmup, total)", ["phase"])
+AUDIO_SECONDS = Counter("tts_audio_seconds_total", "Seconds of audio returned", ["format"])
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+class TelemetryMiddleware:
+    """Pure ASGI middleware: adopts/generates X-Request-ID and times every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode() or uuid.uuid4().hex
+        request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.labels(path=scope["path"], status=str(status["code"])).observe(
+                time.perf_counter() - start)
+
+
+class StatsCollector:
+    """Exposes a stats() dict (e.g. the audio cache's) as gauges at scrape time."""
+
+    def __init__(self, prefix, snapshot):
+        self.prefix = prefix
+        self.snapshot = snapshot
+
+    def collect(self):
+        for key, value in self.snapshot().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key}", value=value)
+
+
+def register_stats(prefix, snapshot):
+    REGISTRY.register(StatsCollector(prefix, snapshot))
+
+
+def metrics_payload():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,41 @@
+import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def to_pcm16(audio):
+    """Float waveform in [-1, 1] -> little-endian 16-bit PCM bytes."""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class SynthesisPool:
+    """Runs synthesis on a fixed set of model replicas, off the event loop.
+
+    Each worker thread checks out one replica for the duration of a render, so
+    at most one request per replica is synthesized at once and the rest wait in the
+    executor queue. Results are rendered straight into memory, no temp files.
+    """
+
+    def __init__(self, models):
+        self.replicas = queue.Queue()
+        for model in models:
+            self.replicas.put(model)
+        self.size = len(models)
+        self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="tts")
+
+    def render_sync(self, text, speaker_id, speed=1.0):
+        model = self.replicas.get()
+        try:
+            # output_path=None makes MeloTTS return the waveform instead of writing a file
+            audio = model.tts_to_file(text, speaker_id, None, speed=speed)
+        finally:
+            self.replicas.put(model)
+        return to_pcm16(audio)
+
+    async def render(self, text, speaker_id, speed=1.0):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.render_sync, text, speaker_id, speed)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
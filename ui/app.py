@@ -1,27 +1,104 @@
 import streamlit as st
 import requests
 import os
+import uuid
+import json
+import time
+import base64
+import hashlib
+from audio_prep import wav_to_l16
+from history import ChatHistory, wav_duration, join_wavs
 
 # --- Configuration ---
 st.set_page_config(page_title="Voice Assistant", page_icon="🎙️")
 st.title("🎙️ Smart Voice Assistant")
 
 ORCHESTRATOR_URL = os.getenv("ORCHESTRATOR_URL", "http://orchestrator:8000")
+# Opus/OGG replies are ~10x smaller than WAV, which keeps the session history small
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "audio/ogg")
+# Play the reply sentence by sentence while it is still being generated (/process/stream)
+STREAM_PLAYBACK = os.getenv("STREAM_PLAYBACK", "1") == "1"
+# Replies whose audio stays in memory; older clips are spilled to a temp directory
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "10"))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "200"))
 
 # --- Session State ---
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "last_processed_audio" not in st.session_state:
-    st.session_state.last_processed_audio = None
+if "session_id" not in st.session_state:
+    # Keys this browser session's conversation context (last city, last appointment) in the orchestrator
+    st.session_state.session_id = uuid.uuid4().hex
+if "history" not in st.session_state:
+    st.session_state.history = ChatHistory(HISTORY_WINDOW, HISTORY_MAX_MESSAGES)
+if "last_processed_hash" not in st.session_state:
+    st.session_state.last_processed_hash = None
+history = st.session_state.history
 
 # --- Display Chat History ---
-for i, msg in enumerate(st.session_state.messages):
+for i, msg in enumerate(history.messages):
     with st.chat_message(msg["role"]):
         st.write(msg["content"])
+        # logic: Autoplay ONLY if it's the last message in the list (and it was not streamed already)
+        is_last_message = (i == len(history.messages) - 1)
         if "audio" in msg:
-            # logic: Autoplay ONLY if it's the last message in the list
-            is_last_message = (i == len(st.session_state.messages) - 1)
-            st.audio(msg["audio"], format="audio/wav", autoplay=is_last_message)
+            # Streamed Opus replies keep one clip per sentence (OGG streams cannot simply be joined)
+            for n, clip in enumerate(msg["audio"]):
+                st.audio(clip, format=msg["format"], autoplay=is_last_message and not msg["played"] and n == 0)
+        elif "audio_paths" in msg:
+            # Spilled to disk: only read back when asked for
+            if st.button("▶ Play", key=f"play-{msg['id']}"):
+                for n, path in enumerate(msg["audio_paths"]):
+                    st.audio(path, format=msg["format"], autoplay=n == 0)
+
+# --- Helpers ---
+def upload_kwargs(audio_value, audio_bytes):
+    """requests.post arguments and headers for the recording."""
+    # 16 kHz mono PCM is what Whisper decodes anyway: smaller upload, no ffmpeg on the server
+    compact = wav_to_l16(audio_bytes)
+    if compact:
+        pcm, content_type = compact
+        return {"data": pcm}, {"Content-Type": content_type}
+    return {"files": {"file": ("audio.wav", audio_value, "audio/wav")}}, {}
+
+def stream_reply(upload, headers, status):
+    """Play the answer sentence by sentence while /process/stream delivers it.
+
+    Returns (user text, answer text, audio clips, their media type). WAV
+    sentences are joined into one clip; other formats keep one clip per sentence.
+    """
+    res = requests.post(f"{ORCHESTRATOR_URL}/process/stream", stream=True,
+                        headers={**headers, "X-Audio-Format": AUDIO_FORMAT}, **upload)
+    res.raise_for_status()
+    user_text, answer, sentences, clips = "", "", [], []
+    media_type = AUDIO_FORMAT
+    text_slot, audio_slot = st.empty(), st.empty()
+    playing_until = 0.0
+    for line in res.iter_lines():
+        if not line:
+            continue
+        event = json.loads(line)
+        if event["type"] == "transcript":
+            user_text = event["text"]
+            status.update(label=f"You said: {user_text}")
+        elif event["type"] == "text":
+            sentences.append(event["text"])
+            text_slot.write(" ".join(sentences))
+        elif event["type"] == "audio":
+            clip = base64.b64decode(event["data"])
+            clips.append(clip)
+            media_type = event.get("media_type", media_type).split(";")[0]
+            # One player at a time: wait until the previous sentence has finished
+            time.sleep(max(0.0, playing_until - time.monotonic()))
+            audio_slot.audio(clip, format=media_type, autoplay=True)
+            # The orchestrator reports the clip length; WAV can also be measured here
+            playing_until = time.monotonic() + (event.get("duration") or wav_duration(clip))
+        elif event["type"] == "error":
+            st.warning(event.get("message", "Something went wrong."))
+        elif event["type"] == "done":
+            answer = event.get("text") or " ".join(sentences)
+    # Let the last sentence finish before the rerun replaces its player
+    time.sleep(max(0.0, playing_until - time.monotonic()))
+    if media_type == "audio/wav" and clips:
+        clips = [join_wavs(clips)]
+    return user_text, answer, clips, media_type
 
 # --- Audio Input ---
 st.write("---")
@@ -30,49 +107,52 @@ audio_value = st.audio_input("Record a voice command")
 # --- Processing Logic ---
 if audio_value:
     # Check if this specific audio file has already been processed
-    # We compare the raw bytes to ensure we don't re-run the same command on refresh
+    # Only a hash of the last recording is kept, enough to not re-run the same command on refresh
     current_audio_bytes = audio_value.getvalue()
-    
-    if st.session_state.last_processed_audio != current_audio_bytes:
-        
+    current_hash = hashlib.sha1(current_audio_bytes).hexdigest()
+
+    if st.session_state.last_processed_hash != current_hash:
+
         with st.status("Processing...", expanded=True) as status:
             try:
                 # 1. Send to Orchestrator
-                files = {"file": ("audio.wav", audio_value, "audio/wav")}
-                res = requests.post(f"{ORCHESTRATOR_URL}/process", files=files)
-                
+                upload, upload_headers = upload_kwargs(audio_value, current_audio_bytes)
+                headers = {"Accept": AUDIO_FORMAT, "X-Session-ID": st.session_state.session_id, **upload_headers}
+
+                if STREAM_PLAYBACK:
+                    user_text, ai_text, response_audio, media_type = stream_reply(upload, headers, status)
+                    status.update(label="Response Received!", state="complete")
+                    if user_text:
+                        history.add("user", user_text)
+                        history.add("assistant", ai_text, response_audio, media_type, played=True)
+                    st.session_state.last_processed_hash = current_hash
+                    st.rerun()
+
+                res = requests.post(f"{ORCHESTRATOR_URL}/process", headers=headers, **upload)
+
                 if res.status_code == 200:
                     status.update(label="Response Received!", state="complete")
-                    
+
                     # 2. Extract Data
                     response_audio = res.content
                     ai_text = res.headers.get("X-Response-Text", "(No response text)")
                     user_text = res.headers.get("X-User-Text", "(No user text)")
-                    
-                    # 3. Update History
-                    # Add User Message
-                    st.session_state.messages.append({
-                        "role": "user", 
-                        "content": user_text
-                    })
-                    
-                    # Add Assistant Message (Text + Audio)
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": ai_text,
-                        "audio": response_audio
-                    })
-                    
+
+                    # 3. Update History (User Message, then Assistant Message with Text + Audio)
+                    history.add("user", user_text)
+                    history.add("assistant", ai_text, response_audio,
+                                res.headers.get("Content-Type", "audio/wav").split(";")[0])
+
                     # 4. Mark this audio as processed
-                    st.session_state.last_processed_audio = current_audio_bytes
-                    
+                    st.session_state.last_processed_hash = current_hash
+
                     # 5. Rerun to display messages at the top
                     st.rerun()
-                    
+
                 else:
                     status.update(label="Error", state="error")
                     st.error(f"Server Error: {res.text}")
-                    
+
             except Exception as e:
                 status.update(label="Connection Failed", state="error")
-                st.error(f"Connection Failed: {e}")
\ No newline at end of file
+                st.error(f"Connection Failed: {e}")
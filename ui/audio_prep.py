@@ -0,0 +1,36 @@
+import io
+import wave
+import numpy as np
+
+TARGET_RATE = 16000
+
+
+def wav_to_l16(wav_bytes, rate=TARGET_RATE):
+    """Downmix and resample a PCM WAV recording to mono 16-bit PCM at `rate`.
+
+    Returns (body, content type) ready to POST as `audio/L16` (big-endian, RFC
+    2586), or None if the recording is not plain 16-bit PCM WAV; the caller then
+    uploads the original file.
+    """
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as f:
+            channels, width, source_rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+            frames = f.readframes(f.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if width != 2:
+        return None
+
+    audio = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+    if channels > 1:
+        audio = audio[:len(audio) // channels * channels].reshape(-1, channels).mean(axis=1)
+    if source_rate != rate and len(audio):
+        ratio = source_rate / rate
+        if ratio > 1:
+            # Box filter as a cheap low-pass before decimating (48 kHz -> 16 kHz averages 3 samples)
+            width = int(round(ratio))
+            audio = np.convolve(audio, np.ones(width, dtype=np.float32) / width, mode="same")
+        n_out = int(len(audio) / ratio)
+        audio = np.interp(np.linspace(0, len(audio) - 1, n_out), np.arange(len(audio)), audio)
+    pcm = np.clip(np.round(audio), -32768, 32767).astype(">i2").tobytes()
+    return pcm, f"audio/L16; rate={rate}; channels=1"
@@ -0,0 +1,81 @@
+import io
+import os
+import wave
+import tempfile
+
+EXTENSIONS = {"audio/wav": ".wav", "audio/ogg": ".ogg", "audio/mpeg": ".mp3"}
+
+
+class ChatHistory:
+    """Chat messages of one browser session, with a bounded memory footprint.
+
+    A message's audio is a list of clips: one for a whole reply, or one per
+    sentence for streamed formats that cannot be joined (Opus/OGG). Only the
+    audio of the newest `window` replies is kept in memory; older clips are
+    written to a per-session temporary directory and played from there.
+    Messages beyond `max_messages` are dropped together with their files. The
+    directory is removed when the session (and with it this object) goes away.
+    """
+
+    def __init__(self, window=10, max_messages=200):
+        self.window = window
+        self.max_messages = max_messages
+        self.messages = []
+        self._dir = tempfile.TemporaryDirectory(prefix="voice-ui-")
+        self._next_id = 0
+
+    def add(self, role, content, audio=None, audio_format="audio/wav", played=False):
+        """`audio` is one clip (bytes) or a list of clips played one after another."""
+        message = {"id": self._next_id, "role": role, "content": content}
+        self._next_id += 1
+        clips = [audio] if isinstance(audio, bytes) else [clip for clip in audio or [] if clip]
+        if clips:
+            # `played`: already heard while streaming, so the history must not autoplay it again
+            message.update(audio=clips, format=audio_format, played=played)
+        self.messages.append(message)
+        self._spill()
+        self._trim()
+        return message
+
+    def _spill(self):
+        in_memory = [m for m in self.messages if "audio" in m]
+        for message in in_memory[:max(0, len(in_memory) - self.window)]:
+            extension = EXTENSIONS.get(message["format"], ".bin")
+            message["audio_paths"] = []
+            for n, clip in enumerate(message.pop("audio")):
+                path = os.path.join(self._dir.name, f"{message['id']}-{n}{extension}")
+                with open(path, "wb") as f:
+                    f.write(clip)
+                message["audio_paths"].append(path)
+
+    def _trim(self):
+        while len(self.messages) > self.max_messages:
+            message = self.messages.pop(0)
+            for path in message.get("audio_paths", []):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def wav_duration(data):
+    """Length of a WAV clip in seconds (0 if it cannot be parsed)."""
+    try:
+        with wave.open(io.BytesIO(data)) as f:
+            return f.getnframes() / float(f.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return 0.0
+
+
+def join_wavs(clips):
+    """Concatenate WAV clips with identical parameters into one WAV file."""
+    if len(clips) == 1:
+        return clips[0]
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        for i, clip in enumerate(clips):
+            with wave.open(io.BytesIO(clip)) as reader:
+                if i == 0:
+                    writer.setparams(reader.getparams())
+                writer.writeframes(reader.readframes(reader.getnframes()))
+    return out.getvalue()
@@ -1,65 +1,249 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Response, HTTPException
+from fastapi.responses import JSONResponse
 from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+from contextlib import asynccontextmanager
+import asyncio
+import io
 import os
-import shutil
+import json
 import traceback
+import numpy as np
+from batching import TranscriptionBatcher, SAMPLE_RATE, trim_silence, decode_batch
+from streaming import StreamingSession, pcm16_to_float, parse_l16
+import telemetry
+from telemetry import STAGE_SECONDS, STREAM_FINALS, STARTUP_SECONDS
+from startup import ModelLoader
+from policy import DecodingPolicy
 
-app = FastAPI()
-
-# Load Model Once at Startup
+# Model (loaded in the background at startup, see ModelLoader)
 model_size = "base.en"
 device = os.getenv("DEVICE", "cpu")
 compute_type = "float16" if device == "cuda" else "int8"
 
-print(f"Loading Whisper ({model_size}) on {device}...")
-model = WhisperModel(model_size, device=device, compute_type=compute_type)
-print("Whisper Loaded.")
+# --- Batching Configuration ---
+# Requests arriving within BATCH_WINDOW_MS of each other are decoded together.
+BATCH_WINDOW_MS = int(os.getenv("ASR_BATCH_WINDOW_MS", "30"))
+MAX_BATCH_SIZE = int(os.getenv("ASR_MAX_BATCH_SIZE", "8"))
+# Number of batches that may run on the model at the same time
+ASR_WORKERS = int(os.getenv("ASR_WORKERS", "1"))
+
+# --- Decoding Policy ---
+# Beam vs. greedy (and the optional fast model) is chosen per clip so that the predicted
+# latency, including the queue ahead of it, stays within ASR_LATENCY_SLO_MS.
+ASR_ADAPTIVE = os.getenv("ASR_ADAPTIVE", "1") == "1"
+ASR_LATENCY_SLO_MS = int(os.getenv("ASR_LATENCY_SLO_MS", "1500"))
+# Results below this avg_logprob are decoded again one step up the quality ladder
+ASR_FALLBACK_LOGPROB = float(os.getenv("ASR_FALLBACK_LOGPROB", "-0.8"))
+# Optional extra variants held in memory, e.g. "tiny.en" and "small.en" (empty = not loaded)
+ASR_FAST_MODEL = os.getenv("ASR_FAST_MODEL", "")
+ASR_ACCURATE_MODEL = os.getenv("ASR_ACCURATE_MODEL", "")
+
+# --- Streaming Configuration ---
+# Trailing silence that ends an utterance, and how often partial transcripts are decoded
+STREAM_SILENCE_MS = int(os.getenv("STREAM_SILENCE_MS", "600"))
+STREAM_PARTIAL_INTERVAL_MS = int(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "700"))
+
+# --- Startup Configuration ---
+# The model is read from the mounted Hugging Face cache; only if it is missing there
+# (first run) and ALLOW_MODEL_DOWNLOAD=1 is it fetched from the network.
+ALLOW_MODEL_DOWNLOAD = os.getenv("ALLOW_MODEL_DOWNLOAD", "1") == "1"
+# Length of the synthetic clip decoded before reporting ready (0 disables the warmup)
+WARMUP_SECONDS = float(os.getenv("ASR_WARMUP_SECONDS", "1"))
+
+batcher = TranscriptionBatcher(None, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE,
+                               workers=ASR_WORKERS)
+policy = DecodingPolicy(batcher, slo_seconds=ASR_LATENCY_SLO_MS / 1000, fallback_logprob=ASR_FALLBACK_LOGPROB,
+                        beam_size=batcher.beam_size, workers=ASR_WORKERS, adaptive=ASR_ADAPTIVE)
+batcher.on_decoded = policy.observe
+
+
+def open_model(size):
+    print(f"Loading Whisper ({size}) on {device}...")
+    kwargs = dict(device=device, compute_type=compute_type, num_workers=ASR_WORKERS)
+    try:
+        model = WhisperModel(size, local_files_only=True, **kwargs)
+    except Exception as e:
+        if not ALLOW_MODEL_DOWNLOAD:
+            raise
+        print(f"Whisper ({size}) not in the local cache ({e}), downloading...")
+        model = WhisperModel(size, **kwargs)
+    print(f"Whisper ({size}) Loaded.")
+    return model
+
+
+def load_model():
+    batcher.model = open_model(model_size)
+    if ASR_FAST_MODEL:
+        batcher.variants["fast"] = open_model(ASR_FAST_MODEL)
+    if ASR_ACCURATE_MODEL:
+        batcher.variants["accurate"] = open_model(ASR_ACCURATE_MODEL)
+
+
+def warmup_model():
+    """Run the Silero VAD and every decode path the policy can pick once on a synthetic clip."""
+    t = np.arange(int(WARMUP_SECONDS * SAMPLE_RATE)) / SAMPLE_RATE
+    clip = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    trim_silence(clip)
+    for beam_size in (batcher.beam_size, 1):
+        decode_batch(batcher.model, [clip], beam_size)
+    if "fast" in batcher.variants:
+        decode_batch(batcher.variants["fast"], [clip], 1)
+    if "accurate" in batcher.variants:
+        decode_batch(batcher.variants["accurate"], [clip], batcher.beam_size)
+
+
+loader = ModelLoader(load_model, warmup_model if WARMUP_SECONDS > 0 else None,
+                     on_phase=lambda phase, seconds: STARTUP_SECONDS.labels(phase=phase).set(seconds))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    loader.start()
+    batcher.start()
+    yield
+    await batcher.stop()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(telemetry.TelemetryMiddleware)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up (the model may still be loading)."""
+    return JSONResponse(loader.status(), status_code=500 if loader.failed else 200)
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the model is loaded and warmed up."""
+    return JSONResponse(loader.status(), status_code=200 if loader.ready else 503)
 
 
 @app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
-    print(f"Processing file: {file.filename}")
+async def transcribe(request: Request):
+    """Transcribe one utterance.
+
+    Accepts either a multipart upload (field `file`, any format ffmpeg reads)
+    or a raw body of type `audio/L16; rate=...; channels=...` (big-endian
+    16-bit PCM, RFC 2586). Raw PCM skips container decoding and ffmpeg, and
+    16 kHz mono needs no resampling at all.
+    """
+    if not loader.ready:
+        raise HTTPException(status_code=503, detail=f"Model {loader.state}.", headers={"Retry-After": "5"})
+    request_id = telemetry.current_request_id()
+    pcm_format = parse_l16(request.headers.get("content-type"))
     try:
-        # Save temp file
-        with open("temp.wav", "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Check if file exists and has size
-        file_size = os.path.getsize("temp.wav")
-        print(f"File saved. Size: {file_size} bytes")
-        
-        if file_size == 0:
+        if pcm_format:
+            print(f"[{request_id}] Processing raw PCM ({pcm_format[0]} Hz, {pcm_format[1]} channel(s))")
+            data = await request.body()
+        else:
+            form = await request.form()
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                raise HTTPException(status_code=422, detail="Expected a multipart field 'file' or an audio/L16 body.")
+            print(f"[{request_id}] Processing file: {file.filename}")
+            # Decode in memory: no shared temp file, so concurrent requests cannot clash
+            data = await file.read()
+        print(f"[{request_id}] File received. Size: {len(data)} bytes")
+
+        if not data:
             return {"text": ""}
 
-        print("Starting transcription...")
-        segments, info = model.transcribe("temp.wav", 
-                                          # A. IMPROVE ACCURACY
-            beam_size=5,            # Searches 5 paths for the best sentence (higher = better accuracy, slightly slower)
-            best_of=5,              # Similar to beam_size, ensures robustness
-    
-             # B. FORCE ENGLISH (Crucial for short commands)
-            language="en",          # Prevents it from guessing the wrong language on short audio
-    
-            # C. REDUCE NOISE & HALLUCINATIONS
-            vad_filter=True,        # Removes silence/background noise before processing
-            vad_parameters=dict(min_silence_duration_ms=500), # Only cut if silence > 0.5s
-    
-            # D. PREVENT "CREATIVE" OUTPUT
-            temperature=0.0,        # 0.0 makes the model deterministic (stick to facts, don't guess)
-    
-            # E. CONTEXT HINT (Helps it understand it's a command)
-            initial_prompt="A user giving a voice command to an AI assistant.")
-        
-        print(f"Detected language '{info.language}' with probability {info.language_probability}")
-        
-        text = " ".join([segment.text for segment in segments]).strip()
-        print(f"Transcription result: {text}")
-        
+        loop = asyncio.get_running_loop()
+        with STAGE_SECONDS.labels(stage="decode_audio").time():
+            if pcm_format:
+                rate, channels = pcm_format
+                audio = pcm16_to_float(data, rate, byteorder=">", channels=channels)
+            else:
+                audio = await loop.run_in_executor(None, decode_audio, io.BytesIO(data), SAMPLE_RATE)
+
+        print(f"[{request_id}] Queueing transcription...")
+        result = await policy.transcribe(audio)
+
+        text = result["text"]
+        print(f"[{request_id}] Transcription result ({result['variant']}, beam {result['beam_size']}): {text}")
+
         return {"text": text}
 
+    except HTTPException:
+        raise
     except Exception as e:
         # --- FIX: Print the actual error ---
         error_msg = str(e)
-        print(f"CRITICAL ERROR: {error_msg}")
+        print(f"[{request_id}] CRITICAL ERROR: {error_msg}")
         traceback.print_exc() # This prints the full error to docker logs
-        return {"text": "", "error": error_msg}
\ No newline at end of file
+        return {"text": "", "error": error_msg}
+
+
+@app.websocket("/stream")
+async def stream(websocket: WebSocket, sample_rate: int = SAMPLE_RATE):
+    """Streaming ASR over a WebSocket.
+
+    The client sends binary frames of raw mono 16-bit little-endian PCM while the
+    user speaks (and may send {"event": "end"} to force the end of an utterance).
+    The server answers with {"type": "partial", "text": ...} while speech goes on
+    and {"type": "final", "text": ..., "reason": ...} once trailing silence is
+    detected. The connection stays open for the next utterance.
+    """
+    if not loader.ready:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    session = StreamingSession(sample_rate=sample_rate, silence_ms=STREAM_SILENCE_MS,
+                               partial_interval_ms=STREAM_PARTIAL_INTERVAL_MS)
+    partial_task = None
+    print(f"Stream opened ({sample_rate} Hz)")
+
+    async def send_partial(utterance, audio):
+        # Greedy decoding: partials are only a preview, speed matters more than beams
+        result = await batcher.submit(audio, beam_size=1)
+        if session.utterance == utterance and result["text"]:
+            await websocket.send_json({"type": "partial", "text": result["text"]})
+
+    async def send_final(reason):
+        nonlocal partial_task
+        audio = session.audio()
+        session.reset()
+        if partial_task and not partial_task.done():
+            partial_task.cancel()
+        result = await policy.transcribe(audio) if len(audio) else {"text": ""}
+        STREAM_FINALS.labels(reason=reason).inc()
+        print(f"Stream final ({reason}): {result['text']}")
+        await websocket.send_json({"type": "final", "text": result["text"], "reason": reason})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                for action in session.feed(message["bytes"]):
+                    if action == "final":
+                        await send_final("silence")
+                    elif partial_task is None or partial_task.done():
+                        # Skip this partial if the previous one is still decoding
+                        partial_task = asyncio.create_task(send_partial(session.utterance, session.audio()))
+            elif message.get("text"):
+                if json.loads(message["text"]).get("event") == "end":
+                    await send_final("end")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if partial_task and not partial_task.done():
+            partial_task.cancel()
+        print("Stream closed")
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: request latency, queue wait, batch sizes, audio seconds."""
+    payload, content_type = telemetry.metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+
+@app.get("/policy")
+async def policy_stats():
+    """Current queue depth and the learned decode cost (seconds per audio second) per setting."""
+    return policy.stats()
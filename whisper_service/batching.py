@@ -0,0 +1,208 @@
+import time
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.vad import get_speech_timestamps
+from telemetry import STAGE_SECONDS, BATCH_SIZE, AUDIO_SECONDS
+
+SAMPLE_RATE = 16000
+# Whisper's encoder window. Clips up to this length (after VAD) are decoded together
+# in one batched generate() call; longer ones fall back to model.transcribe().
+MAX_BATCH_SECONDS = 30
+
+INITIAL_PROMPT = "A user giving a voice command to an AI assistant."
+
+
+def trim_silence(audio):
+    """Keep only the speech regions found by the Silero VAD (silence > 0.5s is cut)."""
+    chunks = get_speech_timestamps(audio, min_silence_duration_ms=500)
+    if not chunks:
+        return audio[:0]
+    return np.concatenate([audio[c["start"]:c["end"]] for c in chunks])
+
+
+def decode_batch(model, audios, beam_size=5):
+    """Decode several short clips with a single encoder/decoder pass.
+
+    Mirrors the settings of the single-file path: English only, beam
+    search, the voice-command initial prompt and no timestamps.
+    """
+    tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual,
+                          task="transcribe", language="en")
+    features = np.stack([pad_or_trim(model.feature_extractor(audio)) for audio in audios])
+    encoder_output = model.encode(features)
+
+    previous_tokens = tokenizer.encode(" " + INITIAL_PROMPT)
+    prompt = model.get_prompt(tokenizer, previous_tokens, without_timestamps=True)
+    results = model.model.generate(
+        encoder_output,
+        [prompt] * len(audios),
+        beam_size=beam_size,
+        max_length=model.max_length,
+        return_scores=True,
+        return_no_speech_prob=True,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+    )
+
+    outputs = []
+    for result in results:
+        tokens = [t for t in result.sequences_ids[0] if t < tokenizer.eot]
+        avg_logprob = result.scores[0]
+        # Same rule as Whisper: silence-like audio with a low-confidence decode is dropped
+        if result.no_speech_prob > 0.6 and avg_logprob < -1.0:
+            outputs.append({"text": "", "avg_logprob": avg_logprob})
+        else:
+            outputs.append({"text": tokenizer.decode(tokens).strip(), "avg_logprob": avg_logprob})
+    return outputs
+
+
+def decode_single(model, audio, beam_size=5):
+    """Fallback for clips that do not fit into one 30 s encoder window."""
+    segments, info = model.transcribe(
+        audio,
+        beam_size=beam_size,
+        best_of=5,
+        language="en",
+        temperature=0.0,
+        initial_prompt=INITIAL_PROMPT,
+    )
+    segments = list(segments)
+    text = " ".join(segment.text for segment in segments).strip()
+    avg_logprob = (sum(s.avg_logprob for s in segments) / len(segments)) if segments else 0.0
+    return {"text": text, "avg_logprob": avg_logprob}
+
+
+class _Job:
+    __slots__ = ("audio", "beam_size", "variant", "future", "queued_at")
+
+    def __init__(self, audio, beam_size, variant, future):
+        self.audio = audio
+        self.beam_size = beam_size
+        self.variant = variant
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class TranscriptionBatcher:
+    """Collects transcription requests over a short window and decodes them as a batch.
+
+    Requests are queued by the event loop, grouped for up to `window_ms` (or until
+    `max_batch` are waiting) and handed to a worker pool, so the model never runs
+    on the event loop thread. Each caller gets back the result for its own audio.
+
+    `model` is the default variant; extra variants ("fast", "accurate") can be
+    registered in `variants`. `on_decoded(variant, beam_size, seconds,
+    audio_seconds)` is called from the worker thread after each decode.
+    """
+
+    def __init__(self, model, window_ms=30, max_batch=8, workers=1, beam_size=5, on_decoded=None):
+        self.model = model
+        self.variants = {}
+        self.on_decoded = on_decoded
+        self.pending = 0  # submitted and not yet answered
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.beam_size = beam_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr")
+        self.queue = None
+        self._collector = None
+        self._inflight = set()
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._collector:
+            self._collector.cancel()
+        self.executor.shutdown(wait=False)
+
+    def model_for(self, variant):
+        return self.variants.get(variant, self.model)
+
+    def depth(self):
+        """Jobs queued or decoding; the load signal for the decoding policy."""
+        return self.pending
+
+    async def submit(self, audio, beam_size=None, variant="default"):
+        """Queue float32 16 kHz mono audio and wait for its transcription result.
+
+        `beam_size=1` requests greedy decoding (used for streaming partials).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        try:
+            await self.queue.put(_Job(audio, beam_size or self.beam_size, variant, future))
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        for job in batch:
+            STAGE_SECONDS.labels(stage="queue_wait").observe(started - job.queued_at)
+            AUDIO_SECONDS.inc(len(job.audio) / SAMPLE_RATE)
+        BATCH_SIZE.observe(len(batch))
+        try:
+            with STAGE_SECONDS.labels(stage="inference").time():
+                results = await loop.run_in_executor(
+                    self.executor, self.run_batch, [(job.audio, job.beam_size, job.variant) for job in batch])
+            for job, result in zip(batch, results):
+                if not job.future.done():
+                    job.future.set_result(result)
+        except Exception as e:
+            traceback.print_exc()
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    def run_batch(self, jobs):
+        """Worker thread: VAD-trim every clip, batch the short ones per (variant, beam size), decode long ones alone."""
+        results = [None] * len(jobs)
+        short = {}  # (variant, beam_size) -> [(index, speech)]
+        for i, (audio, beam_size, variant) in enumerate(jobs):
+            speech = trim_silence(audio)
+            if len(speech) == 0:
+                results[i] = {"text": "", "avg_logprob": 0.0}
+            elif len(speech) <= MAX_BATCH_SECONDS * SAMPLE_RATE:
+                short.setdefault((variant, beam_size), []).append((i, speech))
+            else:
+                start = time.perf_counter()
+                results[i] = decode_single(self.model_for(variant), speech, beam_size)
+                self._decoded(variant, beam_size, time.perf_counter() - start, len(speech))
+
+        for (variant, beam_size), group in short.items():
+            print(f"Decoding batch of {len(group)} clip(s), {variant} model, beam size {beam_size}")
+            start = time.perf_counter()
+            outputs = decode_batch(self.model_for(variant), [speech for _, speech in group], beam_size)
+            # Batched clips share one pass; attribute it to the longest, which bounds the batch
+            self._decoded(variant, beam_size, time.perf_counter() - start, max(len(speech) for _, speech in group))
+            for (i, _), output in zip(group, outputs):
+                results[i] = output
+        return results
+
+    def _decoded(self, variant, beam_size, seconds, samples):
+        if self.on_decoded:
+            self.on_decoded(variant, beam_size, seconds, samples / SAMPLE_RATE)
@@ -0,0 +1,95 @@
+import threading
+from batching import SAMPLE_RATE
+from telemetry import DECODE_CHOICES, DECODE_FALLBACKS
+
+# Starting guesses for the decode cost in seconds per second of audio (base.en, int8,
+# CPU); replaced by measurements as soon as a setting has been used.
+DEFAULT_COSTS = {("fast", 1): 0.04, ("default", 1): 0.08, ("default", 5): 0.15,
+                 ("accurate", 1): 0.25, ("accurate", 5): 0.45}
+# Fixed per-clip overhead (feature extraction, VAD) in seconds
+CLIP_OVERHEAD = 0.05
+
+
+class DecodingPolicy:
+    """Picks model variant and beam size per clip from its length, the queue and a latency SLO.
+
+    The candidates form a ladder from best to cheapest: the default model with
+    beam search, the default model greedy, then the fast model (if one is
+    loaded). The first rung whose predicted latency fits the SLO is used.
+    A result whose avg_logprob is below `fallback_logprob` is decoded once
+    more on the rung above (or the accurate model, if one is loaded).
+    """
+
+    def __init__(self, batcher, slo_seconds=1.5, fallback_logprob=-0.8, beam_size=5,
+                 workers=1, adaptive=True, smoothing=0.2):
+        self.batcher = batcher
+        self.slo = slo_seconds
+        self.fallback_logprob = fallback_logprob
+        self.beam_size = beam_size
+        self.workers = max(1, workers)
+        self.adaptive = adaptive
+        self.smoothing = smoothing
+        self.costs = dict(DEFAULT_COSTS)
+        self.lock = threading.Lock()
+
+    def ladder(self):
+        rungs = [("default", self.beam_size), ("default", 1)]
+        if "fast" in self.batcher.variants:
+            rungs.append(("fast", 1))
+        return rungs
+
+    def predict(self, variant, beam_size, audio_seconds, depth):
+        """Decode time of this clip plus the work queued ahead of it, spread over the workers."""
+        cost = self.costs.get((variant, beam_size), DEFAULT_COSTS[("default", 5)])
+        per_clip = CLIP_OVERHEAD + cost * audio_seconds
+        return per_clip * (1 + depth / self.workers)
+
+    def choose(self, audio_seconds, depth):
+        rungs = self.ladder()
+        if not self.adaptive:
+            return rungs[0]
+        for variant, beam_size in rungs:
+            if self.predict(variant, beam_size, audio_seconds, depth) <= self.slo:
+                return variant, beam_size
+        return rungs[-1]
+
+    def upgrade(self, variant, beam_size):
+        """The next better setting after a low-confidence result, or None."""
+        rungs = self.ladder()
+        index = rungs.index((variant, beam_size)) if (variant, beam_size) in rungs else 0
+        if index > 0:
+            return rungs[index - 1]
+        if "accurate" in self.batcher.variants:
+            return "accurate", self.beam_size
+        return None
+
+    def observe(self, variant, beam_size, seconds, audio_seconds):
+        """Batcher callback (worker thread): fold a measured decode into the cost estimate."""
+        if audio_seconds <= 0:
+            return
+        rate = max(0.0, seconds - CLIP_OVERHEAD) / audio_seconds
+        key = (variant, beam_size)
+        with self.lock:
+            old = self.costs.get(key)
+            self.costs[key] = rate if old is None else old + self.smoothing * (rate - old)
+
+    async def transcribe(self, audio):
+        audio_seconds = len(audio) / SAMPLE_RATE
+        variant, beam_size = self.choose(audio_seconds, self.batcher.depth())
+        DECODE_CHOICES.labels(variant=variant, beam_size=str(beam_size)).inc()
+        result = await self.batcher.submit(audio, beam_size=beam_size, variant=variant)
+
+        if result["text"] and result["avg_logprob"] < self.fallback_logprob:
+            better = self.upgrade(variant, beam_size)
+            if better is not None:
+                DECODE_FALLBACKS.labels(variant=better[0], beam_size=str(better[1])).inc()
+                print(f"Low confidence ({result['avg_logprob']:.2f}) with {variant}/beam {beam_size}, "
+                      f"re-decoding with {better[0]}/beam {better[1]}")
+                variant, beam_size = better
+                result = await self.batcher.submit(audio, beam_size=beam_size, variant=variant)
+        return {**result, "variant": variant, "beam_size": beam_size}
+
+    def stats(self):
+        with self.lock:
+            return {"slo_seconds": self.slo, "depth": self.batcher.depth(),
+                    "costs": {f"{v}/beam{b}": round(c, 4) for (v, b), c in self.costs.items()}}
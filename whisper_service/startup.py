@@ -0,0 +1,65 @@
+import time
+import threading
+import traceback
+
+
+class ModelLoader:
+    """Loads the model in a background thread so the server can answer right away.
+
+    `load()` and then `warmup()` run on a daemon thread started from the
+    lifespan; the service only reports ready once both have finished, so the
+    first real request never pays for lazy initialization. The duration of
+    each phase is kept for /healthz and handed to `on_phase` (metrics).
+    """
+
+    def __init__(self, load, warmup=None, on_phase=None):
+        self.load = load
+        self.warmup = warmup
+        self.on_phase = on_phase
+        self.state = "starting"  # -> loading -> warming -> ready | failed
+        self.error = None
+        self.timings = {}
+        self.started_at = time.monotonic()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    @property
+    def failed(self):
+        return self.state == "failed"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def _phase(self, state, name, fn):
+        self.state = state
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        self.timings[name] = round(seconds, 3)
+        print(f"Startup: {name} took {seconds:.2f}s")
+        if self.on_phase:
+            self.on_phase(name, seconds)
+
+    def _run(self):
+        try:
+            self._phase("loading", "load", self.load)
+            if self.warmup:
+                self._phase("warming", "warmup", self.warmup)
+            total = time.monotonic() - self.started_at
+            self.timings["total"] = round(total, 3)
+            if self.on_phase:
+                self.on_phase("total", total)
+            self.state = "ready"
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            print(f"CRITICAL ERROR: model startup failed: {e}")
+            traceback.print_exc()
+
+    def status(self):
+        return {"state": self.state, "timings": self.timings, "error": self.error}
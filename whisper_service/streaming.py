@@ -0,0 +1,118 @@
+import numpy as np
+from batching import SAMPLE_RATE
+
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+
+def pcm16_to_float(data, sample_rate=SAMPLE_RATE, byteorder="<", channels=1):
+    """Raw 16-bit PCM (interleaved if `channels` > 1) -> mono float32 at 16 kHz."""
+    frame = 2 * channels
+    audio = np.frombuffer(data[:len(data) // frame * frame], dtype=f"{byteorder}i2").astype(np.float32) / 32768
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if sample_rate != SAMPLE_RATE and len(audio):
+        # Linear resampling is plenty for speech going into a 16 kHz log-mel frontend
+        n_out = int(len(audio) * SAMPLE_RATE / sample_rate)
+        audio = np.interp(np.linspace(0, len(audio) - 1, n_out), np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def parse_l16(content_type):
+    """'audio/L16; rate=16000; channels=1' -> (16000, 1); None for any other media type."""
+    media_type, *params = [part.strip() for part in (content_type or "").split(";")]
+    if media_type.lower() != "audio/l16":
+        return None
+    options = dict(p.split("=", 1) for p in params if "=" in p)
+    return int(options.get("rate", SAMPLE_RATE)), int(options.get("channels", 1))
+
+
+class EnergyVAD:
+    """Frame-level energy VAD with an adaptive noise floor.
+
+    Cheap enough to run on every incoming frame; the Silero VAD in the batch
+    path still trims the final utterance before decoding.
+    """
+
+    def __init__(self, threshold=0.01, ratio=3.0):
+        self.threshold = threshold
+        self.ratio = ratio
+        self.noise_floor = threshold / ratio
+
+    def is_speech(self, frame):
+        rms = float(np.sqrt(np.mean(frame * frame))) if len(frame) else 0.0
+        speech = rms > max(self.threshold, self.noise_floor * self.ratio)
+        if not speech:
+            # Track the background level slowly so a noisy room raises the bar
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+
+class StreamingSession:
+    """State of one /stream connection: buffering, endpointing and partial scheduling.
+
+    `feed()` consumes PCM and returns the actions the socket handler has to
+    take: "partial" (decode the utterance so far) and/or "final" (the speaker
+    stopped; decode and reset).
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, silence_ms=600, partial_interval_ms=700,
+                 min_speech_ms=150, max_utterance_s=30):
+        self.sample_rate = sample_rate
+        self.silence_frames = silence_ms // FRAME_MS
+        self.partial_samples = SAMPLE_RATE * partial_interval_ms // 1000
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+        self.max_samples = SAMPLE_RATE * max_utterance_s
+        self.vad = EnergyVAD()
+        self.pending = np.zeros(0, dtype=np.float32)  # not yet framed
+        self.reset()
+
+    def reset(self):
+        self.frames = []
+        self.speech_frames = 0
+        self.trailing_silence = 0
+        self.samples_at_last_partial = 0
+        self.utterance = getattr(self, "utterance", 0) + 1
+
+    @property
+    def in_speech(self):
+        return self.speech_frames >= self.min_speech_frames
+
+    def audio(self):
+        return np.concatenate(self.frames) if self.frames else np.zeros(0, dtype=np.float32)
+
+    def feed(self, data):
+        audio = pcm16_to_float(data, self.sample_rate)
+        self.pending = np.concatenate([self.pending, audio])
+        actions = []
+        while len(self.pending) >= FRAME_SAMPLES:
+            frame, self.pending = self.pending[:FRAME_SAMPLES], self.pending[FRAME_SAMPLES:]
+            if self.vad.is_speech(frame):
+                self.speech_frames += 1
+                self.trailing_silence = 0
+            elif self.speech_frames:
+                self.trailing_silence += 1
+                if not self.in_speech and self.trailing_silence >= self.silence_frames:
+                    # A click or a cough, not speech: back to leading silence
+                    self.speech_frames = 0
+                    self.trailing_silence = 0
+            if not self.speech_frames:
+                # Leading silence: keep only a short pre-roll
+                self.frames = self.frames[-(self.silence_frames or 1):]
+            self.frames.append(frame)
+
+            samples = len(self.frames) * FRAME_SAMPLES
+            if samples >= self.max_samples and not self.in_speech:
+                # Bound the buffer whatever the VAD says (e.g. noise that keeps flickering)
+                self.frames = self.frames[-(self.silence_frames or 1):]
+                self.speech_frames = 0
+                self.trailing_silence = 0
+                samples = len(self.frames) * FRAME_SAMPLES
+            if self.in_speech and (self.trailing_silence >= self.silence_frames or samples >= self.max_samples):
+                actions.append("final")
+                return actions
+            if self.in_speech and samples - self.samples_at_last_partial >= self.partial_samples:
+                self.samples_at_last_partial = samples
+                if "partial" not in actions:
+                    actions.append("partial")
+        return actions
@@ -0,0 +1,63 @@
+import time
+import uuid
+import contextvars
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Set by the orchestrator; generated here for direct callers
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram("whisper_request_seconds", "End-to-end request latency",
+                            ["path", "status"], buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("whisper_stage_seconds", "Latency of one transcription stage "
+                          "(decode_audio, queue_wait, inference)", ["stage"], buckets=LATENCY_BUCKETS)
+BATCH_SIZE = Histogram("whisper_batch_size", "Clips decoded together in one batch",
+                       buckets=(1, 2, 3, 4, 6, 8, 12, 16))
+AUDIO_SECONDS = Counter("whisper_audio_seconds_total", "Seconds of audio transcribed")
+STARTUP_SECONDS = Gauge("whisper_startup_seconds", "Duration of the startup phases (load, warmup, total)", ["phase"])
+DECODE_CHOICES = Counter("whisper_decode_choices_total", "Clips decoded per model variant and beam size",
+                         ["variant", "beam_size"])
+DECODE_FALLBACKS = Counter("whisper_decode_fallbacks_total", "Low-confidence clips decoded again",
+                           ["variant", "beam_size"])
+STREAM_FINALS = Counter("whisper_stream_finals_total", "Streaming utterances finalized", ["reason"])
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+class TelemetryMiddleware:
+    """Pure ASGI middleware: adopts/generates X-Request-ID and times every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.lower().encode(), b"").decode() or uuid.uuid4().hex
+        request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.labels(path=scope["path"], status=str(status["code"])).observe(
+                time.perf_counter() - start)
+
+
+def metrics_payload():
+    return generate_latest(), CONTENT_TYPE_LATEST